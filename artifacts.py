@@ -0,0 +1,78 @@
+import os
+import pickle
+import hashlib
+import logging
+from keyword_matcher import KeywordMatcher
+
+# Версия формата файла; при изменении структуры артефактов её нужно увеличить
+ARTIFACT_VERSION = 1
+SOURCES = ["keywords.py", "compliments.py", "keyword_matcher.py"]
+COMPLIMENT_TABLES = [
+    "weekly_compliments", "sketch_compliments", "tattoo_compliments", "in_progress_compliments",
+    "equipment_compliments", "appointment_compliments", "client_interactions_compliments",
+    "tattoo_ideas_compliments", "equipment_and_studio_compliments"
+]
+
+
+def _signature():
+    digest = hashlib.sha256(str(ARTIFACT_VERSION).encode())
+    base = os.path.dirname(os.path.abspath(__file__))
+    for name in SOURCES:
+        with open(os.path.join(base, name), 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+# Собирает автомат ключевых слов и таблицы комплиментов из исходных модулей
+def build_artifacts():
+    import keywords
+    import compliments
+    matcher = KeywordMatcher({
+        "appointment": keywords.appointment_keywords,
+        "in_progress": keywords.in_progress_keywords,
+        "tattoo": keywords.tattoo_keywords,
+        "sketch": keywords.sketch_keywords,
+        "equipment": keywords.equipment_keywords,
+        "equipment_and_studio": keywords.equipment_and_studio_keywords
+    })
+    return {
+        "matcher": matcher,
+        "compliments": {name: getattr(compliments, name) for name in COMPLIMENT_TABLES},
+        "no_photo_message": compliments.no_photo_message
+    }
+
+
+# Загружает готовые артефакты из path. Если файла нет или keywords.py /
+# compliments.py изменились (сверяется хэш содержимого), артефакты
+# собираются заново и сохраняются.
+def load_artifacts(path):
+    signature = _signature()
+    try:
+        with open(path, 'rb') as f:
+            data = pickle.load(f)
+        if data.get("signature") == signature:
+            return data
+        logging.info("Исходные списки изменились, артефакты будут пересобраны")
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        logging.warning(f"Не удалось прочитать артефакты {path}: {e}")
+    data = build_artifacts()
+    data["signature"] = signature
+    try:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        logging.info(f"Артефакты сохранены в {path}")
+    except Exception as e:
+        logging.warning(f"Не удалось сохранить артефакты {path}: {e}")
+    return data
+
+
+if __name__ == "__main__":
+    # Предварительная сборка, например на шаге CI перед запуском бота
+    from config import Config
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    load_artifacts(Config.ARTIFACT_FILE)
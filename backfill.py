@@ -0,0 +1,123 @@
+import os
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import vk_api
+from telegram_broadcast import TokenBucket
+
+VK_MAX_PAGE_SIZE = 100
+PROGRESS_EVERY = 50
+
+
+# Разбор всей стены группы: страницы wall.get запрашиваются параллельно
+# (по 25 страниц в одном execute, не чаще vk_rate запросов в секунду),
+# посты классифицируются в workers потоков. Каждый готовый пост сразу
+# дописывается строкой JSON в checkpoint_path, поэтому прерванный запуск
+# продолжается с тех постов, которых в файле ещё нет. Посты сверяются по
+# ID, а не по offset: новые посты, появившиеся во время разбора, сдвигают
+# offset, но не ломают продолжение.
+class WallBackfill:
+
+    def __init__(self, group_id, classify_post, checkpoint_path, page_size=100, workers=8,
+                 vk_rate=3, limit=None):
+        self.group_id = str(group_id)
+        self.classify_post = classify_post
+        self.checkpoint_path = checkpoint_path
+        self.page_size = min(page_size, VK_MAX_PAGE_SIZE)
+        self.workers = workers
+        self.limit = limit
+        self.vk_bucket = TokenBucket(vk_rate)
+        self.posts = {}  # post_key -> пост со стены, заполняется в run
+        self._lock = threading.Lock()
+
+    def post_key(self, post):
+        return f"{self.group_id}_{post['id']}"
+
+    # Все строки файла прогресса: {post_key: строка}, отметки об отправке
+    # объединяются со строкой поста
+    def load_checkpoint(self):
+        rows = {}
+        if not os.path.exists(self.checkpoint_path):
+            return rows
+        with open(self.checkpoint_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    # Последняя строка могла оборваться при остановке
+                    logging.warning(f"Пропущена повреждённая строка в {self.checkpoint_path}")
+                    continue
+                rows.setdefault(row["post_key"], {}).update(row)
+        return rows
+
+    def append(self, row):
+        line = json.dumps(row, ensure_ascii=False)
+        with self._lock:
+            with open(self.checkpoint_path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+    def _pages(self, offsets):
+        self.vk_bucket.acquire()
+        return vk_api.wall_get_pages(self.group_id, offsets, self.page_size)
+
+    # Посты стены от новых к старым, без повторов
+    def fetch_posts(self):
+        self.vk_bucket.acquire()
+        first = vk_api.wall_get_pages(self.group_id, [0], self.page_size)[0]
+        if not first:
+            raise vk_api.VKError(f"не удалось получить стену группы {self.group_id}")
+        total = first.get("count", 0)
+        if self.limit:
+            total = min(total, self.limit)
+        logging.info(f"Стена группы {self.group_id}: {total} постов к разбору")
+        offsets = list(range(self.page_size, total, self.page_size))
+        batches = [offsets[i:i + vk_api.EXECUTE_BATCH_SIZE]
+                   for i in range(0, len(offsets), vk_api.EXECUTE_BATCH_SIZE)]
+        pages = [first]
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="backfill-vk") as executor:
+            for responses in executor.map(self._pages, batches):
+                pages.extend(responses)
+        posts = {}
+        for page in pages:
+            if not page:
+                logging.warning(f"Страница стены группы {self.group_id} не получена, часть постов пропущена")
+                continue
+            for post in page.get("items", []):
+                posts.setdefault(post["id"], post)
+        ordered = sorted(posts.values(), key=lambda p: p["date"], reverse=True)
+        return ordered[:self.limit] if self.limit else ordered
+
+    def _process(self, post):
+        row = {"post_key": self.post_key(post), "post_id": post["id"], "date": post["date"]}
+        row.update(self.classify_post(post))
+        self.append(row)
+        return row
+
+    # Классифицирует все ещё не разобранные посты. Возвращает строки
+    # прогресса постов, которые сейчас есть на стене (включая разобранные
+    # прошлыми запусками), от новых к старым
+    def run(self):
+        os.makedirs(os.path.dirname(self.checkpoint_path) or ".", exist_ok=True)
+        rows = self.load_checkpoint()
+        posts = self.fetch_posts()
+        self.posts = {self.post_key(post): post for post in posts}
+        todo = [post for post in posts if self.post_key(post) not in rows]
+        logging.info(f"Уже разобрано {len(posts) - len(todo)}, осталось {len(todo)}")
+        failed = 0
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="backfill") as executor:
+            futures = {executor.submit(self._process, post): post for post in todo}
+            for done, future in enumerate(as_completed(futures), 1):
+                try:
+                    row = future.result()
+                    rows[row["post_key"]] = row
+                except Exception as e:
+                    failed += 1
+                    logging.error(f"Ошибка разбора поста {futures[future].get('id')}: {e}")
+                if done % PROGRESS_EVERY == 0 or done == len(todo):
+                    logging.info(f"Разобрано {done} из {len(todo)} (ошибок: {failed})")
+        return [rows[key] for key in self.posts if key in rows]
+
+    def mark_sent(self, row):
+        row["sent"] = True
+        self.append({"post_key": row["post_key"], "sent": True})
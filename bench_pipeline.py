@@ -0,0 +1,247 @@
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import statistics
+from bench_stubs import ServiceStubs, ServiceBehaviour, SERVICES, CAPTION_SUBJECTS, CAPTION_DETAILS
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+FILLER_WORDS = ["сегодня", "мастер", "студия", "работа", "спасибо", "запись", "новое", "готово",
+                "день", "клиент", "фото", "процесс", "линии", "цвет", "идея", "вечер"]
+
+
+# "vk=50,hf=300" -> {"vk": 0.05, "hf": 0.3}; scale переводит единицы (мс -> с)
+def parse_services(text, scale=1.0):
+    values = {}
+    for item in (text or "").split(","):
+        if "=" in item:
+            name, value = item.split("=", 1)
+            name = name.strip()
+            if name not in SERVICES:
+                raise ValueError(f"неизвестный сервис {name}, доступны: {', '.join(SERVICES)}")
+            values[name] = float(value) * scale
+    return values
+
+
+# Перцентили в миллисекундах по точным значениям
+def summarize(values):
+    if not values:
+        return {"count": 0}
+    ordered = sorted(values)
+
+    def percentile(q):
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+
+    return {
+        "count": len(ordered),
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 3),
+        "p50_ms": round(percentile(0.50), 3),
+        "p95_ms": round(percentile(0.95), 3),
+        "p99_ms": round(percentile(0.99), 3),
+        "max_ms": round(ordered[-1] * 1000, 3)
+    }
+
+
+# Config читает окружение при импорте, поэтому всё выставляется до import bot
+def configure_environment(stubs, groups, args):
+    endpoints = stubs.endpoints()
+    os.environ.update({
+        "VK_TOKEN": "bench", "TELEGRAM_TOKEN": "bench", "HF_TOKEN": "bench",
+        "CHAT_ID": "1001", "CHAT_ID_HER": "1002",
+        "GROUP_ID": ",".join(str(g) for g in groups),
+        "VK_API_URL": endpoints["vk"], "TELEGRAM_API_URL": endpoints["telegram"],
+        "STATE_GIT_SYNC": "0", "METRICS_PORT": "0", "METRICS_FILE": "",
+        "PIPELINE_MODE": args.pipeline_mode, "LOG_LEVEL": args.log_level,
+        # Лимиты Telegram в бенчмарке снимаются, иначе этап telegram
+        # показывает ожидание ведра токенов, а не работу конвейера
+        "TELEGRAM_GLOBAL_RATE": "100000", "TELEGRAM_CHAT_RATE": "100000",
+        "CAPTION_HEDGE_DELAY": str(args.hedge_delay)
+    })
+
+
+def point_analyzer_to_stubs(image_analyzer, stubs):
+    endpoints = stubs.endpoints()
+    image_analyzer.HF_URL = endpoints["hf"]
+    image_analyzer.ALTERNATIVE_URL = endpoints["alternative"]
+    image_analyzer.GOOGLE_TRANSLATE_URL = endpoints["google"]
+    image_analyzer.LIBRETRANSLATE_URL = endpoints["libre"]
+
+
+# Полный прогон job() против заглушек: каждый раунд на стены всех групп
+# добавляются новые посты, job() находит их, подписывает фото, выбирает
+# комплименты и рассылает сообщения. Первый запуск — прогрев (для новой
+# группы бот берёт только последний пост).
+def run_pipeline(bot, image_analyzer, metrics, stubs, groups, args):
+    point_analyzer_to_stubs(image_analyzer, stubs)
+    for group_id in groups:
+        stubs.add_posts(group_id, 1, photos=args.photos)
+    state = bot.load_state()
+    bot.job(state)
+    metrics.reset()
+    sent_before = len(stubs.sent)
+    job_times = []
+    for _ in range(args.rounds):
+        for group_id in groups:
+            stubs.add_posts(group_id, args.posts, photos=args.photos, text=random.choice(["", "новый эскиз", "сеанс"]))
+        started = time.perf_counter()
+        bot.job(state)
+        job_times.append(time.perf_counter() - started)
+    samples = metrics.samples
+    return {
+        "job": summarize(job_times),
+        "stages": {dict(key).get("stage"): summarize(values)
+                   for key, values in samples.get("bot_stage_duration_seconds", {}).items()},
+        "providers": {"{provider}/{outcome}".format(**dict(key)): summarize(values)
+                      for key, values in samples.get("bot_provider_duration_seconds", {}).items()},
+        "counters": {name: {",".join(f"{k}={v}" for k, v in key) or "total": value for key, value in series.items()}
+                     for name, series in metrics.counters().items()},
+        "messages_sent": len(stubs.sent) - sent_before,
+        "stub_requests": dict(stubs.requests)
+    }
+
+
+# Синтетические посты: текст из случайных слов, в части постов — ключевое
+# слово одной из категорий; подписи к фото — как у сервиса подписи
+def synthetic_posts(count, seed=1):
+    import keywords
+    rng = random.Random(seed)
+    keyword_lists = [keywords.appointment_keywords, keywords.in_progress_keywords, keywords.tattoo_keywords,
+                     keywords.sketch_keywords, keywords.equipment_keywords, keywords.equipment_and_studio_keywords]
+    posts = []
+    for _ in range(count):
+        words = rng.choices(FILLER_WORDS, k=rng.randint(1, 30))
+        if rng.random() < 0.6:
+            words.insert(rng.randrange(len(words)), rng.choice(rng.choice(keyword_lists)))
+        captions = [f"{rng.choice(CAPTION_SUBJECTS)} {rng.choice(CAPTION_DETAILS)}"
+                    for _ in range(rng.choice([0, 1, 1, 2, 4]))]
+        posts.append((" ".join(words), captions, "photo" if captions else None))
+    return posts
+
+
+def bench_classify(bot, posts):
+    timings = []
+    categories = {}
+    started = time.perf_counter()
+    for post_text, captions, media_type in posts:
+        call_started = time.perf_counter()
+        category = bot.classify_media(post_text, captions, media_type)
+        timings.append(time.perf_counter() - call_started)
+        categories[category] = categories.get(category, 0) + 1
+    total = time.perf_counter() - started
+    return dict(summarize(timings), total_s=round(total, 3), per_second=round(len(posts) / total),
+                categories=categories)
+
+
+def bench_compliments(bot, count):
+    compliments = bot.get_compliments("tattoo_compliments")
+    state = {"compliment_decks": {}}
+    timings = []
+    started = time.perf_counter()
+    for _ in range(count):
+        call_started = time.perf_counter()
+        bot.get_unique_compliment(compliments, "bench_compliments_used", state)
+        timings.append(time.perf_counter() - call_started)
+    total = time.perf_counter() - started
+    return dict(summarize(timings), total_s=round(total, 3), per_second=round(count / total),
+                deck_size=len(compliments), state_bytes=len(json.dumps(state["compliment_decks"])))
+
+
+# Сравнение с сохранённым прогоном: отношение текущих p50/p95 к прежним
+def compare(results, baseline):
+    rows = []
+
+    def walk(current, previous, path):
+        for key, value in current.items():
+            if isinstance(value, dict) and isinstance(previous.get(key), dict):
+                walk(value, previous[key], f"{path}{key}.")
+            elif key in ("p50_ms", "p95_ms", "per_second") and previous.get(key):
+                rows.append((f"{path}{key}", previous[key], value, value / previous[key]))
+
+    walk(results, baseline, "")
+    for name, before, after, ratio in rows:
+        print(f"{name:60} {before:12.3f} -> {after:12.3f}   x{ratio:.2f}")
+    return rows
+
+
+def print_summary(results):
+    job = results["pipeline"]["job"]
+    print(f"job()      p50 {job['p50_ms']:9.2f} мс  p95 {job['p95_ms']:9.2f} мс  p99 {job['p99_ms']:9.2f} мс  "
+          f"n={job['count']}, сообщений {results['pipeline']['messages_sent']}")
+    for stage, summary in sorted(results["pipeline"]["stages"].items()):
+        print(f"  этап {stage:18} p50 {summary['p50_ms']:9.2f} мс  p95 {summary['p95_ms']:9.2f} мс  "
+              f"p99 {summary['p99_ms']:9.2f} мс  n={summary['count']}")
+    for name, summary in results["micro"].items():
+        print(f"{name:24} {summary['per_second']:>10} вызовов/с  p50 {summary['p50_ms']:.4f} мс  "
+              f"p99 {summary['p99_ms']:.4f} мс")
+
+
+def run(args):
+    behaviours = {name: ServiceBehaviour() for name in SERVICES}
+    latency = parse_services(args.latency, 0.001)
+    jitter = parse_services(args.jitter, 0.001)
+    errors = parse_services(args.error_rate)
+    for name, behaviour in behaviours.items():
+        behaviour.latency = latency.get(name, 0.0)
+        behaviour.jitter = jitter.get(name, 0.0)
+        behaviour.error_rate = errors.get(name, 0.0)
+    random.seed(args.seed)
+    stubs = ServiceStubs(behaviours).start()
+    groups = [-(i + 1) for i in range(args.groups)]
+    workdir = tempfile.mkdtemp(prefix="bench_pipeline_")
+    cwd = os.getcwd()
+    try:
+        os.chdir(workdir)
+        configure_environment(stubs, groups, args)
+        sys.path.insert(0, BASE_DIR)
+        import bot
+        import image_analyzer
+        from metrics import registry as metrics
+        metrics.keep_samples = True
+        results = {
+            "config": vars(args),
+            "python": sys.version.split()[0],
+            "pipeline": run_pipeline(bot, image_analyzer, metrics, stubs, groups, args)
+        }
+        posts = synthetic_posts(args.corpus, args.seed)
+        results["micro"] = {
+            "classify_media": bench_classify(bot, posts),
+            "get_unique_compliment": bench_compliments(bot, args.corpus)
+        }
+        bot.state_store.flush()
+    finally:
+        os.chdir(cwd)
+        stubs.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pipeline benchmark against local VK/Telegram/HF/translate stubs")
+    parser.add_argument('--rounds', type=int, default=20, help='job() runs after the warm-up')
+    parser.add_argument('--groups', type=int, default=3)
+    parser.add_argument('--posts', type=int, default=2, help='New posts per group per round')
+    parser.add_argument('--photos', type=int, default=1, help='Photos per post')
+    parser.add_argument('--corpus', type=int, default=100000, help='Synthetic posts for the micro-benchmarks')
+    parser.add_argument('--latency', default="vk=30,telegram=20,hf=150,alternative=200,translate=40,image=15",
+                        help='Stub latency per service, ms')
+    parser.add_argument('--jitter', default="", help='Random +- latency per service, ms')
+    parser.add_argument('--error-rate', default="", help='Failure share per service, e.g. hf=0.2')
+    parser.add_argument('--hedge-delay', type=float, default=3.0)
+    parser.add_argument('--pipeline-mode', choices=["sync", "async"], default="sync")
+    parser.add_argument('--log-level', default="WARNING")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', type=str, help='Save results as JSON')
+    parser.add_argument('--baseline', type=str, help='Compare with a previously saved JSON')
+    args = parser.parse_args()
+    results = run(args)
+    print_summary(results)
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            compare(results, json.load(f))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=4)
@@ -0,0 +1,67 @@
+import os
+import sys
+import json
+import shutil
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Что успевает сделать каждый режим запуска до первой сетевой операции
+MODES = {
+    "poll": "bot.load_state()",
+    "compliment": "bot.load_state(); bot.get_compliments('weekly_compliments')",
+    "post": "bot.load_state(); bot.get_artifacts()['matcher']; bot.get_analyzer()",
+    "async": "bot.load_state(); bot.get_analyzer(); import asyncio, aiohttp",
+    "webhook": "bot.load_state(); from webhook import create_app; create_app(lambda post: None)",
+    "longpoll": "bot.load_state(); import longpoll",
+}
+
+SCRIPT = """
+import time
+started = time.perf_counter()
+import bot
+{action}
+print(time.perf_counter() - started)
+"""
+
+
+def measure(mode, workdir):
+    env = dict(os.environ, PYTHONPATH=BASE_DIR, STATE_GIT_SYNC="0")
+    result = subprocess.run([sys.executable, "-c", SCRIPT.format(action=MODES[mode])],
+                            cwd=workdir, env=env, capture_output=True, text=True, check=True)
+    return float(result.stdout.strip().splitlines()[-1]) * 1000
+
+
+# Замер времени запуска бота для каждого режима CLI, в отдельном процессе
+# на каждый прогон. cold — без собранных артефактов, warm — с ними.
+def run(repeats):
+    results = {}
+    for mode in MODES:
+        workdir = tempfile.mkdtemp(prefix="bench_startup_")
+        try:
+            shutil.copy(os.path.join(BASE_DIR, "bot_state.json"), workdir)
+            cold = measure(mode, workdir)
+            warm = [measure(mode, workdir) for _ in range(repeats)]
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+        results[mode] = {
+            "cold_ms": round(cold, 1),
+            "warm_median_ms": round(statistics.median(warm), 1),
+            "warm_min_ms": round(min(warm), 1)
+        }
+        print(f"{mode:12} cold {cold:8.1f} мс   warm median {results[mode]['warm_median_ms']:8.1f} мс")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--output', type=str, help='Save results as JSON')
+    args = parser.parse_args()
+    results = run(args.repeats)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=4)
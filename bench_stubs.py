@@ -0,0 +1,204 @@
+import re
+import json
+import time
+import random
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+
+SERVICES = ["vk", "telegram", "hf", "alternative", "translate", "image"]
+
+CAPTION_SUBJECTS = ["a tattoo", "a sketch", "a drawing", "a tattoo machine", "an arm with a tattoo",
+                    "a design", "a line art", "a needle", "a studio", "an outline"]
+CAPTION_DETAILS = ["of a rose", "of a snake", "with black ink", "on paper", "of a skull",
+                   "of a dragon", "with red lines", "on skin", "of a wolf", "in progress"]
+WALL_GET_CALL = re.compile(r"API\.wall\.get\((\{.*?\})\)")
+
+
+# Задержка и доля ошибок одного сервиса. latency и jitter — в секундах;
+# ошибка — ответ 500 (или 429 для Telegram) после той же задержки
+class ServiceBehaviour:
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+
+    def delay(self):
+        wait = self.latency + random.uniform(-self.jitter, self.jitter)
+        if wait > 0:
+            time.sleep(wait)
+
+    def fails(self):
+        return random.random() < self.error_rate
+
+
+# Локальные заменители VK API (wall.get и execute), Telegram sendMessage,
+# Hugging Face, запасного API подписи, Google Translate, LibreTranslate и
+# сервера картинок в одном HTTP-сервере. Стены групп заполняются через
+# add_posts, отправленные сообщения копятся в sent.
+class ServiceStubs:
+
+    def __init__(self, behaviours=None, host="127.0.0.1", port=0, image_size=20 * 1024):
+        self.behaviours = {name: ServiceBehaviour() for name in SERVICES}
+        self.behaviours.update(behaviours or {})
+        self.image_size = image_size
+        self.walls = {}  # owner_id -> посты, новые первыми
+        self.sent = []
+        self.requests = {name: 0 for name in SERVICES}
+        self._next_post_id = 1
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self.url = f"http://{host}:{self._server.server_address[1]}"
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True, name="bench-stubs").start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    # Адреса для подстановки в Config и image_analyzer
+    def endpoints(self):
+        return {
+            "vk": f"{self.url}/method/",
+            "telegram": self.url,
+            "hf": f"{self.url}/models/blip",
+            "alternative": f"{self.url}/v1/caption",
+            "google": f"{self.url}/translate_a/single",
+            "libre": f"{self.url}/translate"
+        }
+
+    # Добавляет на стену группы count постов с photos фото в каждом
+    def add_posts(self, owner_id, count, photos=1, text=""):
+        owner_id = int(owner_id)
+        added = []
+        with self._lock:
+            wall = self.walls.setdefault(owner_id, [])
+            for _ in range(count):
+                post_id = self._next_post_id
+                self._next_post_id += 1
+                date = wall[0]["date"] + 1 if wall else int(time.time())
+                post = {"id": post_id, "owner_id": owner_id, "date": date, "text": text,
+                        "attachments": [self._photo(post_id, i) for i in range(photos)]}
+                wall.insert(0, post)
+                added.append(post)
+        return added
+
+    def _photo(self, post_id, index):
+        return {"type": "photo", "photo": {"sizes": [
+            {"type": "x", "url": f"{self.url}/img/{post_id}_{index}.jpg", "width": 604, "height": 604}
+        ]}}
+
+    def _wall_get(self, params):
+        owner_id = int(params.get("owner_id", 0))
+        count, offset = int(params.get("count", 20)), int(params.get("offset", 0))
+        with self._lock:
+            wall = self.walls.get(owner_id, [])
+            return {"count": len(wall), "items": wall[offset:offset + count]}
+
+    def _vk(self, method, params):
+        if method == "wall.get":
+            return {"response": self._wall_get(params)}
+        if method == "execute":
+            calls = [json.loads(match) for match in WALL_GET_CALL.findall(params.get("code", ""))]
+            return {"response": [self._wall_get(call) for call in calls]}
+        return {"error": {"error_code": 3, "error_msg": f"Unknown method {method}"}}
+
+    def _image(self, name):
+        # Разные байты для разных фото, чтобы кэш по хэшу не срабатывал
+        seed = name.encode()
+        return b"\xff\xd8\xff\xe0" + (seed * (self.image_size // len(seed) + 1))[:self.image_size]
+
+    @staticmethod
+    def _caption():
+        return f"{random.choice(CAPTION_SUBJECTS)} {random.choice(CAPTION_DETAILS)}"
+
+    def _handler(self):
+        stubs = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Заголовки и тело уходят отдельными записями; без TCP_NODELAY
+            # задержанный ACK добавляет к каждому ответу около 40 мс
+            disable_nagle_algorithm = True
+
+            def _read(self):
+                parts = urlsplit(self.path)
+                params = {k: v[0] for k, v in parse_qs(parts.query).items()}
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                content_type = self.headers.get("Content-Type", "")
+                if body and content_type.startswith("application/x-www-form-urlencoded"):
+                    params.update({k: v[0] for k, v in parse_qs(body.decode()).items()})
+                elif body and content_type.startswith("application/json"):
+                    params.update(json.loads(body))
+                return parts.path, params
+
+            def _reply(self, status, payload, content_type="application/json"):
+                body = payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _service(self, path):
+                if path.startswith("/method/"):
+                    return "vk"
+                if path.startswith("/bot"):
+                    return "telegram"
+                if path.startswith("/models/"):
+                    return "hf"
+                if path == "/v1/caption":
+                    return "alternative"
+                if path in ("/translate_a/single", "/translate"):
+                    return "translate"
+                if path.startswith("/img/"):
+                    return "image"
+                return None
+
+            def _dispatch(self):
+                path, params = self._read()
+                service = self._service(path)
+                if service is None:
+                    self._reply(404, {"error": "not found"})
+                    return
+                behaviour = stubs.behaviours[service]
+                with stubs._lock:
+                    stubs.requests[service] += 1
+                behaviour.delay()
+                if behaviour.fails():
+                    if service == "telegram":
+                        self._reply(429, {"ok": False, "parameters": {"retry_after": 0}})
+                    else:
+                        self._reply(500, {"error": "stub failure"})
+                    return
+                if service == "vk":
+                    self._reply(200, stubs._vk(path[len("/method/"):], params))
+                elif service == "telegram":
+                    with stubs._lock:
+                        stubs.sent.append((params.get("chat_id"), params.get("text")))
+                    self._reply(200, {"ok": True, "result": {"message_id": len(stubs.sent)}})
+                elif service == "hf":
+                    self._reply(200, [{"generated_text": stubs._caption()}])
+                elif service == "alternative":
+                    self._reply(200, {"caption": stubs._caption()})
+                elif path == "/translate":
+                    q = params.get("q")
+                    self._reply(200, {"translatedText": [f"[ru] {text}" for text in q] if isinstance(q, list) else f"[ru] {q}"})
+                elif service == "translate":
+                    lines = params.get("q", "").split("\n")
+                    self._reply(200, [[["\n".join(f"[ru] {line}" for line in lines), params.get("q", "")]]])
+                else:
+                    self._reply(200, stubs._image(path), content_type="image/jpeg")
+
+            do_GET = _dispatch
+            do_POST = _dispatch
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
@@ -1,112 +1,229 @@
 import os
 import sys
-import json
-import random
+import queue
 import logging
-import requests
+import threading
 import argparse
-import subprocess
-import schedule
 from datetime import datetime
 from config import Config
-from image_analyzer import ImageAnalyzer
-from keywords import sketch_keywords, tattoo_keywords, in_progress_keywords, equipment_keywords, appointment_keywords, equipment_and_studio_keywords
-from compliments import (
-    weekly_compliments, sketch_compliments, tattoo_compliments, in_progress_compliments,
-    equipment_compliments, appointment_compliments, client_interactions_compliments,
-    tattoo_ideas_compliments, equipment_and_studio_compliments, no_photo_message
-)
+from structured_log import setup_logging, parse_sample_rates, payload
+import vk_api
+from state_store import StateStore, JsonStateBackend, SqliteStateBackend, GitSync
+from artifacts import load_artifacts
+from compliment_deck import ComplimentDeck
+from metrics import registry as metrics
+
+# Настройка логирования: запись уходит в очередь, форматирование и вывод —
+# в отдельном потоке; большие значения логируются через payload()
+setup_logging(Config.LOG_LEVEL, Config.LOG_FORMAT, parse_sample_rates(Config.LOG_SAMPLE_RATES),
+              Config.LOG_MAX_PAYLOAD)
+
+# Тяжёлые объекты создаются при первом обращении: запуск без новых постов
+# не строит анализатор изображений и не загружает списки комплиментов
+analyzer = None
+artifacts = None
 
-# Настройка логирования
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+# Автомат ключевых слов и таблицы комплиментов из заранее собранного файла
+def get_artifacts():
+    global artifacts
+    if artifacts is None:
+        artifacts = load_artifacts(Config.ARTIFACT_FILE)
+    return artifacts
+
+def get_compliments(name):
+    return get_artifacts()["compliments"][name]
 
 # Создаём объект для анализа изображений
-analyzer = ImageAnalyzer(Config.HF_TOKEN, Config.YNDX_API_KEY)
-logging.info("Инициализация ImageAnalyzer завершена")
+def get_analyzer():
+    global analyzer
+    if analyzer is None:
+        from image_analyzer import ImageAnalyzer
+        from caption_cache import CaptionCache
+        from translation_cache import TranslationCache
+        caption_cache = CaptionCache(Config.CAPTION_CACHE_FILE, ttl=Config.CAPTION_CACHE_TTL,
+                                     memory_size=Config.CAPTION_CACHE_MEMORY_SIZE,
+                                     disk_size=Config.CAPTION_CACHE_DISK_SIZE)
+        translation_cache = TranslationCache(Config.TRANSLATION_CACHE_FILE)
+        analyzer = ImageAnalyzer(Config.HF_TOKEN, Config.YNDX_API_KEY, cache=caption_cache,
+                                 translations=translation_cache, hedge_delay=Config.CAPTION_HEDGE_DELAY,
+                                 caption_deadline=Config.CAPTION_DEADLINE,
+                                 breaker_threshold=Config.BREAKER_FAILURE_THRESHOLD,
+                                 breaker_reset_timeout=Config.BREAKER_RESET_TIMEOUT,
+                                 max_image_bytes=Config.IMAGE_MAX_BYTES,
+                                 max_parallel_images=Config.MAX_PARALLEL_IMAGES)
+        analyzer.backends = create_caption_backends(analyzer, Config.CAPTION_BACKENDS)
+        metrics.gauge("bot_cache_requests_total", lambda: cache_requests(caption_cache, translation_cache),
+                      metric_type="counter")
+        metrics.gauge("bot_cache_hit_ratio", lambda: [
+            ({"cache": "caption"}, round(caption_cache.hit_rate(), 4)),
+            ({"cache": "translation"}, round(translation_hit_rate(translation_cache), 4))
+        ])
+        logging.info("Инициализация ImageAnalyzer завершена")
+    return analyzer
+
+# Порядок способов описания фото: remote — сервисы подписи, local — офлайн-признаки на NumPy
+def create_caption_backends(analyzer, names):
+    from image_analyzer import RemoteCaptionBackend
+    backends = []
+    for name in names:
+        if name == "remote":
+            backends.append(RemoteCaptionBackend(analyzer))
+        elif name == "local":
+            from local_classifier import LocalFeatureBackend
+            backends.append(LocalFeatureBackend())
+        else:
+            logging.error(f"Неизвестный способ описания изображений: {name}")
+    return backends
+
+# Обращения к кэшам по результату, для метрик
+def cache_requests(caption_cache, translation_cache):
+    values = [({"cache": "caption", "result": result}, count) for result, count in caption_cache.stats.items()]
+    values += [({"cache": "translation", "result": result}, count) for result, count in translation_cache.stats.items()]
+    return values
+
+def translation_hit_rate(translation_cache):
+    total = translation_cache.stats["hits"] + translation_cache.stats["misses"]
+    return translation_cache.stats["hits"] / total if total else 0.0
+
+# Порядок приоритета категорий для текста поста и для подписи к фото
+POST_TEXT_PRIORITY = ["appointment", "in_progress", "tattoo", "sketch", "equipment", "equipment_and_studio"]
+CAPTION_PRIORITY = ["appointment", "tattoo", "in_progress", "sketch", "equipment", "equipment_and_studio"]
 
 # Работа с состоянием
+def default_state():
+    return {
+        "last_checked_by_group": {},
+        "longpoll_ts": {},
+        "processed_posts": {},
+        "compliment_decks": {},
+        "last_equipment_and_studio_day": -1,
+        "scheduled_at": {}
+    }
+
+def create_state_backend():
+    if Config.STATE_BACKEND == "sqlite":
+        return SqliteStateBackend(Config.STATE_DB, default_state, json_path=Config.STATE_FILE,
+                                  retention_days=Config.STATE_RETENTION_DAYS)
+    return JsonStateBackend(Config.STATE_FILE, default_state)
+
+state_store = StateStore(
+    create_state_backend(),
+    flush_interval=Config.STATE_FLUSH_INTERVAL,
+    sinks=[GitSync()] if Config.STATE_GIT_SYNC else []
+)
+
 def load_state():
-    logging.info("Загрузка состояния из файла...")
-    try:
-        with open(Config.STATE_FILE, 'r', encoding='utf-8') as f:
-            state = json.load(f)
-            logging.info("Состояние успешно загружено")
-            return state
-    except (FileNotFoundError, json.JSONDecodeError):
-        logging.info("Файл состояния не найден или повреждён, создаётся новый")
-        return {
-            "last_checked": None,
-            "processed_posts": {},
-            "weekly_compliments_used": [],
-            "client_interactions_compliments_used": [],
-            "tattoo_ideas_compliments_used": [],
-            "equipment_and_studio_compliments_used": [],
-            "sketch_compliments_used": [],
-            "tattoo_compliments_used": [],
-            "in_progress_compliments_used": [],
-            "equipment_compliments_used": [],
-            "appointment_compliments_used": [],
-            "last_equipment_and_studio_day": -1
-        }
+    state = state_store.load()
+    # Старый формат: списки уже отправленных комплиментов целиком.
+    # Колоды по ним не восстановить, поэтому они начинают новый цикл.
+    legacy = [key for key, value in state.items() if key.endswith("_compliments_used") and isinstance(value, list)]
+    for key in legacy:
+        del state[key]
+    if legacy:
+        logging.info(f"Списки использованных комплиментов заменены колодами: {len(legacy)}")
+        state_store.mark_dirty()
+    # Старый формат: одна дата last_checked на все группы. Переносится один
+    # раз в группы, настроенные сейчас; группа, добавленная позже, начинает
+    # с самого свежего поста, а не со всей стены с этой даты.
+    if "last_checked" in state:
+        legacy_checked = state.pop("last_checked")
+        if legacy_checked:
+            by_group = state.setdefault("last_checked_by_group", {})
+            for group_id in Config.GROUP_IDS:
+                by_group.setdefault(group_id, legacy_checked)
+            logging.info(f"Общая дата last_checked перенесена в группы {Config.GROUP_IDS}")
+        state_store.mark_dirty()
+    return state
 
+# Изменения копятся в памяти и сбрасываются на диск (и в git) пачкой
 def save_state(state):
-    logging.info("Сохранение состояния в файл...")
-    try:
-        with open(Config.STATE_FILE, 'w', encoding='utf-8') as f:
-            json.dump(state, f, indent=4)
-        subprocess.run(['git', 'config', '--global', 'user.email', 'bot@example.com'], check=True)
-        subprocess.run(['git', 'config', '--global', 'user.name', 'Bot'], check=True)
-        subprocess.run(['git', 'add', Config.STATE_FILE], check=True)
-        result = subprocess.run(['git', 'commit', '-m', f'Update {Config.STATE_FILE}'], capture_output=True, text=True)
-        if result.returncode == 0:
-            subprocess.run(['git', 'push', 'origin', 'main'], check=True)
-            logging.info("Состояние успешно сохранено")
-        else:
-            logging.info("Нет изменений для коммита")
-    except Exception as e:
-        logging.error(f"Ошибка сохранения состояния: {e}")
+    state_store.mark_dirty()
+    state_store.maybe_flush()
+
+# Поле верхнего уровня состояния, в котором лежит key: у студии — всё её
+# пространство имён, иначе само поле. Передаётся в state_store.mark_dirty,
+# чтобы сброс записывал только его.
+def state_key(state, key):
+    return getattr(state, "namespace_key", key)
+
+# Функция для выбора комплимента без повторений. В состоянии у каждой
+# колоды только seed и ключ последнего комплимента, запись на диск — вместе
+# с очередным сбросом состояния, а не на каждый выбор.
+decks = {}
 
-# Функция для выбора комплимента без повторений
 def get_unique_compliment(compliments_list, used_list_key, state):
     if not compliments_list:
         logging.error(f"Список комплиментов для {used_list_key} пуст!")
         return "У меня закончились комплименты, но ты всё равно молодец! 😊"
-    used_compliments = state.get(used_list_key, [])
-    available_compliments = [comp for comp in compliments_list if comp not in used_compliments]
-    if not available_compliments:
-        state[used_list_key] = []
-        available_compliments = compliments_list
+    deck = decks.get(used_list_key)
+    if deck is None or deck.compliments is not compliments_list:
+        deck = decks[used_list_key] = ComplimentDeck(compliments_list)
+    deck_states = state.setdefault("compliment_decks", {})
+    compliment, deck_states[used_list_key], restarted = deck.draw(deck_states.get(used_list_key))
+    if restarted:
         logging.info(f"Список комплиментов для {used_list_key} исчерпан, перезапуск цикла")
-    compliment = random.choice(available_compliments)
-    state[used_list_key].append(compliment)
-    save_state(state)
+    state_store.mark_dirty(state_key(state, "compliment_decks"))
     return compliment
 
-# Извлечение медиа (фото или видео) из поста
-def get_media_url(post):
+# Примерная ширина копий VK по типу, если width/height не пришли в ответе
+VK_SIZE_WIDTHS = {"s": 75, "m": 130, "o": 130, "p": 200, "q": 320, "r": 510, "x": 604, "y": 807, "z": 1080, "w": 2560}
+
+def photo_size_dims(size):
+    width, height = size.get('width') or 0, size.get('height') or 0
+    if not width or not height:
+        width = height = VK_SIZE_WIDTHS.get(size.get('type'), 0)
+    return width, height
+
+# Копии o/p/q/r VK обрезает под 3:2, на них видна только часть фото
+CROPPED_SIZE_TYPES = {"o", "p", "q", "r"}
+
+# Самая маленькая копия фото, у которой обе стороны не меньше target;
+# если таких нет — самая большая из имеющихся. Обрезанные копии берутся,
+# только если других нет.
+def select_photo_size(sizes, target):
+    sizes = [s for s in sizes if s.get('type') not in CROPPED_SIZE_TYPES] or sizes
+    large_enough = [s for s in sizes if min(photo_size_dims(s)) >= target]
+    if large_enough:
+        return min(large_enough, key=lambda s: photo_size_dims(s)[0] * photo_size_dims(s)[1])
+    return max(sizes, key=lambda s: photo_size_dims(s)[0] * photo_size_dims(s)[1])
+
+# Извлечение всех медиа (фото и видео) из поста: [(url, тип), ...]
+def get_media_items(post):
     logging.info("Извлечение URL медиа из поста")
+    items = []
     for attachment in post.get('attachments', []):
         if attachment.get('type') == 'photo':
             sizes = attachment.get('photo', {}).get('sizes', [])
             if sizes:
-                url = max(sizes, key=lambda s: s.get('width', 0) * s.get('height', 0)).get('url')
-                logging.info(f"Найден URL фото: {url}")
-                return url, "photo"
+                url = select_photo_size(sizes, get_analyzer().target_resolution).get('url')
+                logging.info("Найден URL фото: %s", url, extra={"event": "media_url"})
+                items.append((url, "photo"))
         elif attachment.get('type') == 'video':
             video = attachment.get('video', {})
             owner_id = video.get('owner_id')
             video_id = video.get('id')
             if owner_id and video_id:
                 url = f"https://vk.com/video{owner_id}_{video_id}"
-                logging.info(f"Найден URL видео: {url}")
-                return url, "video"
-    logging.warning("Медиа (фото или видео) не найдено в посте")
-    return None, None
+                logging.info("Найден URL видео: %s", url, extra={"event": "media_url"})
+                items.append((url, "video"))
+    if not items:
+        logging.warning("Медиа (фото или видео) не найдено в посте")
+    return items
 
-# Классификация медиа
+# Первое медиа поста (фото или видео)
+def get_media_url(post):
+    items = get_media_items(post)
+    return items[0] if items else (None, None)
+
+# Классификация медиа. caption — подпись к фото или список подписей ко всем
+# фото поста; по подписям категория выбирается большинством голосов
+@metrics.timed("bot_stage_duration_seconds", stage="classify")
 def classify_media(post_text, caption, media_type):
-    logging.info(f"Классификация медиа: post_text={post_text}, caption={caption}, media_type={media_type}")
-    caption_lower = caption.lower() if caption else ""
+    logging.info("Классификация медиа: post_text=%s, caption=%s, media_type=%s",
+                 payload(post_text), payload(caption), media_type, extra={"event": "classify"})
+    captions = [caption] if isinstance(caption, str) else list(caption or [])
+    captions_lower = [c.lower() for c in captions if c]
+    caption_lower = "; ".join(captions_lower)
     post_text_lower = post_text.lower() if post_text else ""
     post_lines = post_text_lower.split('\n')
     first_line = post_lines[0] if post_lines else ""
@@ -117,44 +234,24 @@ def classify_media(post_text, caption, media_type):
         return "tattoo"
 
     if post_text_lower:
-        if any(keyword in post_text_lower for keyword in appointment_keywords):
-            logging.info(f"Определён тип: appointment (по тексту поста: {post_text_lower})")
-            return "appointment"
-        elif any(keyword in post_text_lower for keyword in in_progress_keywords):
-            logging.info(f"Определён тип: in_progress (по тексту поста: {post_text_lower})")
-            return "in_progress"
-        elif any(keyword in post_text_lower for keyword in tattoo_keywords):
-            logging.info(f"Определён тип: tattoo (по тексту поста: {post_text_lower})")
-            return "tattoo"
-        elif any(keyword in post_text_lower for keyword in sketch_keywords):
-            logging.info(f"Определён тип: sketch (по тексту поста: {post_text_lower})")
-            return "sketch"
-        elif any(keyword in post_text_lower for keyword in equipment_keywords):
-            logging.info(f"Определён тип: equipment (по тексту поста: {post_text_lower})")
-            return "equipment"
-        elif any(keyword in post_text_lower for keyword in equipment_and_studio_keywords):
-            logging.info(f"Определён тип: equipment_and_studio (по тексту поста: {post_text_lower})")
-            return "equipment_and_studio"
+        category = get_artifacts()["matcher"].first_category(post_text_lower, POST_TEXT_PRIORITY)
+        if category:
+            logging.info("Определён тип: %s (по тексту поста: %s)", category, payload(post_text_lower),
+                         extra={"event": "classify"})
+            return category
 
     if caption_lower:
-        if any(keyword in caption_lower for keyword in appointment_keywords):
-            logging.info(f"Определён тип: appointment (по подписи: {caption_lower})")
-            return "appointment"
-        elif any(keyword in caption_lower for keyword in tattoo_keywords):
-            logging.info(f"Определён тип: tattoo (по подписи: {caption_lower})")
-            return "tattoo"
-        elif any(keyword in caption_lower for keyword in in_progress_keywords):
-            logging.info(f"Определён тип: in_progress (по подписи: {caption_lower})")
-            return "in_progress"
-        elif any(keyword in caption_lower for keyword in sketch_keywords):
-            logging.info(f"Определён тип: sketch (по подписи: {caption_lower})")
-            return "sketch"
-        elif any(keyword in caption_lower for keyword in equipment_keywords):
-            logging.info(f"Определён тип: equipment (по подписи: {caption_lower})")
-            return "equipment"
-        elif any(keyword in caption_lower for keyword in equipment_and_studio_keywords):
-            logging.info(f"Определён тип: equipment_and_studio (по подписи: {caption_lower})")
-            return "equipment_and_studio"
+        votes = {}
+        for text in captions_lower:
+            category = get_artifacts()["matcher"].first_category(text, CAPTION_PRIORITY)
+            if category:
+                votes[category] = votes.get(category, 0) + 1
+        if votes:
+            # При равенстве голосов действует обычный приоритет категорий
+            category = max(votes, key=lambda c: (votes[c], -CAPTION_PRIORITY.index(c)))
+            logging.info("Определён тип: %s (по подписи: %s)", category, payload(caption_lower),
+                         extra={"event": "classify"})
+            return category
 
     if media_type == "video":
         logging.info("Видео без явной классификации, возвращаем 'tattoo' по умолчанию")
@@ -169,95 +266,252 @@ def classify_media(post_text, caption, media_type):
 def get_compliment(post_text, caption, media_type, state):
     logging.info("Выбор комплимента")
     image_type = classify_media(post_text, caption, media_type)
-    logging.info(f"Выбран тип медиа: {image_type}")
+    logging.info("Выбран тип медиа: %s", image_type, extra={"event": "classify"})
     if image_type == "sketch":
-        return get_unique_compliment(sketch_compliments, "sketch_compliments_used", state)
+        return get_unique_compliment(get_compliments("sketch_compliments"), "sketch_compliments_used", state)
     elif image_type == "tattoo":
-        return get_unique_compliment(tattoo_compliments, "tattoo_compliments_used", state)
+        return get_unique_compliment(get_compliments("tattoo_compliments"), "tattoo_compliments_used", state)
     elif image_type == "in_progress":
-        return get_unique_compliment(in_progress_compliments, "in_progress_compliments_used", state)
+        return get_unique_compliment(get_compliments("in_progress_compliments"), "in_progress_compliments_used", state)
     elif image_type == "equipment":
-        return get_unique_compliment(equipment_compliments, "equipment_compliments_used", state)
+        return get_unique_compliment(get_compliments("equipment_compliments"), "equipment_compliments_used", state)
     elif image_type == "appointment":
-        return get_unique_compliment(appointment_compliments, "appointment_compliments_used", state)
+        return get_unique_compliment(get_compliments("appointment_compliments"), "appointment_compliments_used", state)
     elif image_type == "equipment_and_studio":
-        return get_unique_compliment(equipment_and_studio_compliments, "equipment_and_studio_compliments_used", state)
-    return get_unique_compliment(tattoo_compliments, "tattoo_compliments_used", state)
+        return get_unique_compliment(get_compliments("equipment_and_studio_compliments"), "equipment_and_studio_compliments_used", state)
+    return get_unique_compliment(get_compliments("tattoo_compliments"), "tattoo_compliments_used", state)
 
-# Проверка новых постов
-def check_new_post(state):
-    logging.info("Начало проверки новых постов")
-    last_checked = state["last_checked"]
+# Дата последнего проверенного поста для группы (у каждой группы своя)
+def get_last_checked(state, group_id):
+    last_checked = state.setdefault("last_checked_by_group", {}).get(group_id)
+    if not last_checked:
+        return None
+    try:
+        return datetime.fromisoformat(last_checked)
+    except ValueError:
+        logging.warning(f"Некорректный формат last_checked для группы {group_id}: {last_checked}, сбрасываем")
+        return None
+
+def set_last_checked(state, group_id, post_date):
+    state.setdefault("last_checked_by_group", {})[group_id] = post_date.isoformat()
+
+# Отбор новых постов со страницы wall.get одной группы.
+# Возвращает (новые посты, дошли ли до уже проверенных постов)
+def collect_new_posts(state, group_id, posts, last_checked_date):
     processed_posts = state["processed_posts"]
-    url = f"https://api.vk.com/method/wall.get?owner_id={Config.GROUP_ID}&count=5&access_token={Config.VK_TOKEN}&v=5.131"
+    new_posts = []
+    reached_watermark = False
+    for post in posts:
+        post_id = post["id"]
+        post_date = datetime.fromtimestamp(post["date"])
+        is_pinned = post.get("is_pinned", False)
+        logging.info("Обработка поста: группа=%s, ID=%s, дата=%s, закреплён=%s", group_id, post_id, post_date, is_pinned,
+                     extra={"event": "vk_post"})
+        if last_checked_date and post_date <= last_checked_date:
+            if is_pinned:
+                # Закреплённый пост всегда первый на стене, граница ещё не достигнута
+                logging.info("Пропуск закреплённого старого поста: ID=%s", post_id, extra={"event": "vk_post"})
+                continue
+            reached_watermark = True
+            break
+        if f"{group_id}_{post_id}" not in processed_posts:
+            new_posts.append(post)
+    return new_posts, reached_watermark
+
+# Проверка новых постов во всех отслеживаемых группах.
+# Стены запрашиваются пачками по 25 групп через execute и листаются назад
+# через offset, пока не дойдём до даты последней проверки. Возвращает все
+# непросмотренные посты в хронологическом порядке. Дата последней проверки
+# группы сдвигается, только если стена пролистана до конца: после сбоя на
+# одной из страниц следующий опрос доберёт более старые посты. group_states — своё
+# состояние для каждой группы (у студий в режиме нескольких студий), по
+# умолчанию — группы из Config.GROUP_IDS с общим state.
+@metrics.timed("bot_stage_duration_seconds", stage="vk_poll")
+def check_new_post(state, group_states=None):
+    logging.info("Начало проверки новых постов")
+    group_states = group_states or {group_id: state for group_id in Config.GROUP_IDS}
+    new_posts = []
+    drained = set()
     try:
-        logging.info(f"Запрос к VK API: {url}")
-        response = requests.get(url, timeout=10).json()
-        logging.info(f"Ответ VK API: {response}")
-        if "response" in response and response["response"]["items"]:
-            posts = response["response"]["items"]
-            last_checked_date = None
-            if last_checked:
-                try:
-                    last_checked_date = datetime.fromisoformat(last_checked)
-                except ValueError:
-                    logging.warning(f"Некорректный формат last_checked: {last_checked}, сбрасываем")
-                    last_checked_date = None
-
-            for post in posts:
-                post_id = post["id"]
-                post_date = datetime.fromtimestamp(post["date"])
-                is_pinned = post.get("is_pinned", False)
-
-                logging.info(f"Обработка поста: ID={post_id}, дата={post_date}, закреплён={is_pinned}")
-                if str(post_id) not in processed_posts:
-                    if not last_checked_date or post_date > last_checked_date:
-                        if is_pinned and last_checked_date and post_date <= last_checked_date:
-                            logging.info(f"Пропуск закреплённого старого поста: ID={post_id}")
-                            continue
-                        state["last_checked"] = post_date.isoformat()
-                        processed_posts[str(post_id)] = True
-                        save_state(state)
-                        media_url, media_type = get_media_url(post)
-                        logging.info(f"Новый пост найден: ID={post_id}, медиа={media_url}, тип={media_type}, текст={post.get('text', '')}")
-                        return True, media_url, media_type, post.get("text", "")
-            if posts:
-                newest_post_date = max(datetime.fromtimestamp(post["date"]) for post in posts)
-                state["last_checked"] = newest_post_date.isoformat()
-                save_state(state)
-            logging.info("Новых незакреплённых постов не найдено")
-        else:
-            logging.warning("Ответ VK API не содержит постов")
+        pending = list(group_states)
+        watermarks = {group_id: get_last_checked(group_states[group_id], group_id) for group_id in pending}
+        offset = 0
+        while pending:
+            logging.info("Запрос к VK API: wall.get для групп %s, offset=%s", payload(pending), offset,
+                         extra={"event": "vk_request"})
+            walls = vk_api.wall_get_many(pending, count=Config.WALL_PAGE_SIZE, offset=offset)
+            still_pending = []
+            for group_id, response in walls.items():
+                logging.info("Ответ VK API для группы %s: %s", group_id, payload(response),
+                             extra={"event": "vk_response"})
+                if not response:
+                    logging.warning(f"Стена группы {group_id} не получена (offset={offset}), "
+                                    f"дата проверки не сдвигается")
+                    continue
+                if not response.get("items"):
+                    if offset == 0:
+                        logging.warning(f"Ответ VK API не содержит постов для группы {group_id}")
+                    drained.add(group_id)
+                    continue
+                posts = response["items"]
+                last_checked_date = watermarks[group_id]
+                if not last_checked_date:
+                    # Первый запуск для группы: берём только самый свежий пост, а не всю стену
+                    posts = [max(posts, key=lambda p: p["date"])]
+                found, reached_watermark = collect_new_posts(group_states[group_id], group_id, posts, last_checked_date)
+                new_posts.extend(found)
+                if (last_checked_date and not reached_watermark
+                        and offset + len(response["items"]) < response.get("count", 0)):
+                    still_pending.append(group_id)
+                else:
+                    drained.add(group_id)
+            pending = still_pending
+            offset += Config.WALL_PAGE_SIZE
     except Exception as e:
         logging.error(f"Ошибка проверки постов: {e}")
-    logging.info("Новых постов не найдено или произошла ошибка")
-    return False, None, None, ""
+    # Запросы к VK идут без блокировки, под ней — только изменение состояния
+    with state_store.lock:
+        new_posts = mark_processed(state, new_posts, group_states, drained)
+    if new_posts:
+        logging.info(f"Найдено новых постов: {len(new_posts)}")
+    else:
+        logging.info("Новых постов не найдено или произошла ошибка")
+    return new_posts
+
+# Отмечает посты обработанными и сдвигает даты последней проверки групп
+# (только групп из drained, если он задан). Возвращает ещё не обработанные
+# посты в хронологическом порядке.
+def mark_processed(state, posts, group_states=None, drained=None):
+    accepted = []
+    for post in sorted(posts, key=lambda p: p["date"]):
+        group_id = str(post["owner_id"])
+        state = group_states.get(group_id, state) if group_states else state
+        post_key = f"{group_id}_{post['id']}"
+        if post_key in state["processed_posts"]:
+            continue
+        state["processed_posts"][post_key] = True
+        state_store.add_processed(post_key)
+        accepted.append(post)
+        if drained is not None and group_id not in drained:
+            continue
+        last_checked_date = get_last_checked(state, group_id)
+        post_date = datetime.fromtimestamp(post["date"])
+        if not last_checked_date or post_date > last_checked_date:
+            set_last_checked(state, group_id, post_date)
+            state_store.mark_dirty(state_key(state, "last_checked_by_group"))
+    if accepted:
+        state_store.maybe_flush()
+    return accepted
 
-# Отправка сообщения в Telegram
-def send_telegram_message(text):
-    logging.info(f"Подготовка отправки сообщения в Telegram: {text}")
+# Очередь постов, пришедших событиями VK (Callback API), и фоновый обработчик.
+# В очереди пары (пост, нужно ли ещё проверить и отметить его обработанным).
+post_queue = queue.Queue()
+metrics.gauge("bot_queue_depth", lambda: [({"queue": "posts"}, post_queue.qsize())])
+
+# Вызывается из обработчика HTTP-запроса VK, поэтому только кладёт пост в
+# очередь: отметка в состоянии (и возможный сброс с git push) — в post_worker
+def enqueue_post(state, post):
+    if str(post.get("owner_id")) not in Config.GROUP_IDS:
+        logging.warning(f"Пост из неотслеживаемой группы {post.get('owner_id')} пропущен")
+        return False
+    post_queue.put((post, True))
+    return True
+
+def post_worker(state):
+    while True:
+        post, unchecked = post_queue.get()
+        try:
+            if unchecked:
+                with state_store.lock:
+                    if not mark_processed(state, [post]):
+                        continue
+            process_post(post, state)
+        except Exception as e:
+            logging.error(f"Ошибка обработки поста {post.get('id')}: {e}")
+        finally:
+            post_queue.task_done()
+
+# Отправка сообщения в Telegram всем получателям параллельно
+broadcaster = None
+
+def get_recipients():
+    return [chat_id for chat_id in [Config.CHAT_ID_TRACKING, Config.CHAT_ID_HER] + Config.EXTRA_CHAT_IDS if chat_id]
+
+# recipients — получатели студии, по умолчанию чаты из Config
+def send_telegram_message(text, recipients=None):
+    global broadcaster
+    logging.info("Подготовка отправки сообщения в Telegram: %s", payload(text), extra={"event": "telegram"})
     if not Config.TELEGRAM_TOKEN:
         logging.error("TELEGRAM_TOKEN не задан, пропуск отправки сообщения")
+        return {}
+    if recipients is None:
+        if not Config.CHAT_ID_TRACKING or not Config.CHAT_ID_HER:
+            logging.error(f"CHAT_ID_TRACKING ({Config.CHAT_ID_TRACKING}) или CHAT_ID_HER ({Config.CHAT_ID_HER}) не заданы, пропуск отправки сообщения")
+            return {}
+        recipients = get_recipients()
+    if broadcaster is None:
+        from telegram_broadcast import TelegramBroadcaster
+        broadcaster = TelegramBroadcaster(Config.TELEGRAM_TOKEN, Config.TELEGRAM_GLOBAL_RATE,
+                                          Config.TELEGRAM_CHAT_RATE, Config.TELEGRAM_BROADCAST_WORKERS,
+                                          api_url=Config.TELEGRAM_API_URL)
+    with metrics.timer("bot_stage_duration_seconds", stage="telegram"):
+        report = broadcaster.broadcast(text, recipients)
+    for result in report.values():
+        metrics.inc("bot_telegram_messages_total", status="ok" if result["ok"] else "error")
+    failed = [chat_id for chat_id, result in report.items() if not result["ok"]]
+    if failed:
+        logging.error(f"Сообщение не доставлено в чаты: {failed}")
+    return report
+
+# Текст комплимента для поста по уже полученным подписям к фото
+def compose_message(post, caption, state):
+    media_url, media_type = get_media_url(post)
+    post_text = post.get("text", "")
+    logging.info("Обработка нового поста: ID=%s, медиа=%s, тип=%s, текст=%s", post['id'], media_url, media_type,
+                 payload(post_text), extra={"event": "post"})
+    if media_url:
+        return get_compliment(post_text, caption, media_type, state)
+    return get_compliment(post_text, None, media_type, state) if post_text else get_artifacts()["no_photo_message"]
+
+# Обработка одного нового поста: подписи ко всем фото, комплимент, отправка
+@metrics.timed("bot_stage_duration_seconds", stage="process_post")
+def process_post(post, state, recipients=None):
+    photo_urls = [url for url, media_type in get_media_items(post) if media_type == "photo"]
+    captions = get_analyzer().get_image_captions(photo_urls)
+    with state_store.lock:
+        message = compose_message(post, captions, state)
+    send_telegram_message(message, recipients)
+    metrics.inc("bot_posts_processed_total")
+
+# Асинхронный конвейер (PIPELINE_MODE=async): подписи для всех новых постов
+# считаются параллельно с ограничением по этапам, а комплименты выбираются
+# и отправляются строго в хронологическом порядке, как в синхронном режиме.
+async def job_async(state):
+    import asyncio
+    import http_client
+    posts = await asyncio.to_thread(check_new_post, state)
+    if not posts:
         return
-    if not Config.CHAT_ID_TRACKING or not Config.CHAT_ID_HER:
-        logging.error(f"CHAT_ID_TRACKING ({Config.CHAT_ID_TRACKING}) или CHAT_ID_HER ({Config.CHAT_ID_HER}) не заданы, пропуск отправки сообщения")
-        return
-    url = f"https://api.telegram.org/bot{Config.TELEGRAM_TOKEN}/sendMessage"
-    params_tracking = {"chat_id": Config.CHAT_ID_TRACKING, "text": text}
-    params_her = {"chat_id": Config.CHAT_ID_HER, "text": text}
-    try:
-        response = requests.post(url, params=params_tracking, timeout=10)
-        if response.status_code == 200:
-            logging.info(f"Сообщение успешно отправлено в Telegram (tracking, chat_id={Config.CHAT_ID_TRACKING})")
-        else:
-            logging.error(f"Ошибка Telegram (tracking): {response.status_code}, {response.text}")
-        response = requests.post(url, params=params_her, timeout=10)
-        if response.status_code == 200:
-            logging.info(f"Сообщение успешно отправлено в Telegram (her, chat_id={Config.CHAT_ID_HER})")
-        else:
-            logging.error(f"Ошибка Telegram (her): {response.status_code}, {response.text}")
-    except Exception as e:
-        logging.error(f"Ошибка отправки в Telegram: {e}")
+    limits = {
+        "download": asyncio.Semaphore(Config.PIPELINE_DOWNLOAD_CONCURRENCY),
+        "caption": asyncio.Semaphore(Config.PIPELINE_CAPTION_CONCURRENCY),
+        "translate": asyncio.Semaphore(Config.PIPELINE_TRANSLATE_CONCURRENCY)
+    }
+    async with http_client.create_async_session() as session:
+        async def caption_post(post):
+            photo_urls = [url for url, media_type in get_media_items(post) if media_type == "photo"]
+            return await get_analyzer().get_image_captions_async(session, photo_urls, limits)
+
+        caption_tasks = [asyncio.create_task(caption_post(post)) for post in posts]
+        for post, caption_task in zip(posts, caption_tasks):
+            try:
+                captions = await caption_task
+                with state_store.lock:
+                    message = compose_message(post, captions, state)
+                await asyncio.to_thread(send_telegram_message, message)
+                metrics.inc("bot_posts_processed_total")
+            except Exception as e:
+                logging.error(f"Ошибка обработки поста {post.get('id')}: {e}")
 
 # Основная работа
 def job(state, compliment_type=None):
@@ -265,86 +519,260 @@ def job(state, compliment_type=None):
         if compliment_type:
             logging.info(f"Отправка комплимента типа {compliment_type}")
             if compliment_type == "weekly":
-                message = get_unique_compliment(weekly_compliments, "weekly_compliments_used", state)
+                message = get_unique_compliment(get_compliments("weekly_compliments"), "weekly_compliments_used", state)
                 send_telegram_message(message)
             elif compliment_type == "client_interactions":
-                message = get_unique_compliment(client_interactions_compliments, "client_interactions_compliments_used", state)
+                message = get_unique_compliment(get_compliments("client_interactions_compliments"), "client_interactions_compliments_used", state)
                 send_telegram_message(message)
             elif compliment_type == "tattoo_ideas":
-                message = get_unique_compliment(tattoo_ideas_compliments, "tattoo_ideas_compliments_used", state)
+                message = get_unique_compliment(get_compliments("tattoo_ideas_compliments"), "tattoo_ideas_compliments_used", state)
                 send_telegram_message(message)
             elif compliment_type == "equipment_and_studio":
-                message = get_unique_compliment(equipment_and_studio_compliments, "equipment_and_studio_compliments_used", state)
+                message = get_unique_compliment(get_compliments("equipment_and_studio_compliments"), "equipment_and_studio_compliments_used", state)
                 send_telegram_message(message)
             else:
                 logging.error(f"Неизвестный тип комплимента: {compliment_type}")
                 return
         else:
             logging.info("Запуск проверки постов (job)")
-            has_new_post, media_url, media_type, post_text = check_new_post(state)
-            if has_new_post:
-                logging.info("Обработка нового поста")
-                if media_url:
-                    caption = analyzer.get_image_caption(media_url) if media_type == "photo" else None
-                    message = get_compliment(post_text, caption, media_type, state)
-                else:
-                    message = get_compliment(post_text, None, media_type, state) if post_text else no_photo_message
-                send_telegram_message(message)
+            if Config.PIPELINE_MODE == "async":
+                import asyncio
+                asyncio.run(job_async(state))
+                return
+            for post in check_new_post(state):
+                try:
+                    process_post(post, state)
+                except Exception as e:
+                    logging.error(f"Ошибка обработки поста {post.get('id')}: {e}")
     except Exception as e:
         logging.error(f"Ошибка в функции job: {e}")
         save_state(state)
 
-# Функция для генерации случайного времени между 10:00 и 13:00
-def get_random_time():
-    hours = random.randint(10, 12)
-    minutes = random.randint(0, 59)
-    return f"{hours:02d}:{minutes:02d}"
-
-# Планирование отправки комплиментов для "equipment_and_studio"
-def schedule_equipment_and_studio(state):
-    days = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
-    random_day = random.choice(days)
-    random_time = get_random_time()
-    getattr(schedule.every(), random_day).at(random_time).do(lambda: send_telegram_message(
-        get_unique_compliment(equipment_and_studio_compliments, "equipment_and_studio_compliments_used", state)))
-    logging.info(f"Запланирована отправка комплимента equipment_and_studio на {random_day} в {random_time}")
-
-# Запуск планировщика
-def run_scheduler(state):
+# Отправка запланированного комплимента
+def send_scheduled_compliment(compliments_list, used_list_key, state, recipients=None):
+    with state_store.lock:
+        message = get_unique_compliment(compliments_list, used_list_key, state)
+    send_telegram_message(message, recipients)
+
+# Недельные комплименты: тип -> (список, ключ колоды, план по времени)
+def scheduled_compliments():
+    from timer_scheduler import weekly_on, weekly_random_day
+    return {
+        "weekly": ("weekly_compliments", "weekly_compliments_used", weekly_on("monday")),
+        "client_interactions": ("client_interactions_compliments", "client_interactions_compliments_used", weekly_on("friday")),
+        "tattoo_ideas": ("tattoo_ideas_compliments", "tattoo_ideas_compliments_used", weekly_on("wednesday")),
+        "equipment_and_studio": ("equipment_and_studio_compliments", "equipment_and_studio_compliments_used", weekly_random_day)
+    }
+
+# Запуск планировщика. poll=False — без опроса стены (посты приходят событиями).
+# Время недельных комплиментов хранится в состоянии (scheduled_at) и
+# сохраняется сразу, поэтому перезапуск не выбирает его заново.
+def run_scheduler(state, poll=True):
+    import asyncio
+    from timer_scheduler import TimerScheduler
     logging.info("Запуск планировщика...")
-    schedule.every(1).minutes.do(lambda: job(state))
-    random_time_weekly = get_random_time()
-    schedule.every().monday.at(random_time_weekly).do(lambda: send_telegram_message(
-        get_unique_compliment(weekly_compliments, "weekly_compliments_used", state)))
-    logging.info(f"Запланирована отправка комплимента weekly на понедельник в {random_time_weekly}")
-    random_time_client = get_random_time()
-    schedule.every().friday.at(random_time_client).do(lambda: send_telegram_message(
-        get_unique_compliment(client_interactions_compliments, "client_interactions_compliments_used", state)))
-    logging.info(f"Запланирована отправка комплимента client_interactions на пятницу в {random_time_client}")
-    random_time_ideas = get_random_time()
-    schedule.every().wednesday.at(random_time_ideas).do(lambda: send_telegram_message(
-        get_unique_compliment(tattoo_ideas_compliments, "tattoo_ideas_compliments_used", state)))
-    logging.info(f"Запланирована отправка комплимента tattoo_ideas на среду в {random_time_ideas}")
-    schedule_equipment_and_studio(state)
-    while True:
-        try:
-            schedule.run_pending()
-            time.sleep(1)
-        except Exception as e:
-            logging.error(f"Ошибка в планировщике: {e}")
 
-import time  # Добавляем импорт time для sleep
+    def persist():
+        with state_store.lock:
+            state_store.mark_dirty("scheduled_at")
+            state_store.flush()
+
+    scheduler = TimerScheduler(state.setdefault("scheduled_at", {}), persist)
+    if poll:
+        scheduler.every("poll", 60, lambda: job(state))
+    scheduler.every("flush", Config.STATE_FLUSH_INTERVAL, state_store.flush)
+    for name, (list_name, used_list_key, plan) in scheduled_compliments().items():
+        scheduler.planned_job(name, lambda list_name=list_name, used_list_key=used_list_key: send_scheduled_compliment(
+            get_compliments(list_name), used_list_key, state), plan)
+    asyncio.run(scheduler.run())
+
+# Режим нескольких студий (TENANTS_FILE): группы всех студий опрашиваются
+# одним общим проходом (execute на 25 групп), новые посты и недельные
+# комплименты выполняются в общем пуле потоков по очереди студий, у каждой
+# студии — свои получатели, колоды и даты проверки в состоянии.
+def load_tenant_registry(state):
+    from tenants import load_tenants
+    with state_store.lock:
+        registry = load_tenants(Config.TENANTS_FILE, state)
+        state_store.mark_dirty()
+    return registry
+
+def poll_tenants(state, registry, pool):
+    logging.info("Запуск проверки постов всех студий")
+    posts = check_new_post(state, registry.group_states())
+    for post in posts:
+        tenant = registry.tenant_for(post)
+        pool.submit(tenant.name, process_post, post, tenant.state, tenant.recipients)
+
+def submit_tenant_compliment(pool, tenant, compliment_type):
+    list_name, used_list_key, _ = scheduled_compliments()[compliment_type]
+    pool.submit(tenant.name, lambda: send_scheduled_compliment(get_compliments(list_name), used_list_key,
+                                                               tenant.state, tenant.recipients))
+
+# once=True — один опрос (или один тип комплимента всем студиям) и выход
+def run_tenants(state, once=False, compliment_type=None):
+    from tenants import FairWorkerPool
+    registry = load_tenant_registry(state)
+    get_analyzer().reserve_callers(Config.TENANT_WORKERS)
+    pool = FairWorkerPool(Config.TENANT_WORKERS)
+    if compliment_type:
+        if compliment_type not in scheduled_compliments():
+            logging.error(f"Неизвестный тип комплимента: {compliment_type}")
+            return
+        for tenant in registry.tenants:
+            if compliment_type in tenant.compliments:
+                submit_tenant_compliment(pool, tenant, compliment_type)
+        pool.join()
+        return
+    if once:
+        poll_tenants(state, registry, pool)
+        pool.join()
+        return
+    import asyncio
+    from timer_scheduler import TimerScheduler
+
+    def persist():
+        with state_store.lock:
+            # Время запуска лежит в пространствах имён студий
+            state_store.mark_dirty("scheduled_at", *(tenant.state.namespace_key for tenant in registry.tenants))
+            state_store.flush()
+
+    scheduler = TimerScheduler(state.setdefault("scheduled_at", {}), persist)
+    scheduler.every("poll", 60, lambda: poll_tenants(state, registry, pool))
+    scheduler.every("flush", Config.STATE_FLUSH_INTERVAL, state_store.flush)
+    schedule = scheduled_compliments()
+    for tenant in registry.tenants:
+        for compliment_type in tenant.compliments:
+            scheduler.planned_job(f"{tenant.name}:{compliment_type}",
+                                  lambda tenant=tenant, compliment_type=compliment_type: submit_tenant_compliment(
+                                      pool, tenant, compliment_type),
+                                  schedule[compliment_type][2], planned=tenant.state["scheduled_at"],
+                                  key=compliment_type)
+    asyncio.run(scheduler.run())
+
+# Режим Callback API: VK сам присылает новые посты на HTTP-адрес бота
+def run_webhook(state):
+    from webhook import create_app
+    threading.Thread(target=post_worker, args=(state,), daemon=True, name="post-worker").start()
+    threading.Thread(target=run_scheduler, args=(state, False), daemon=True, name="scheduler").start()
+    app = create_app(lambda post: enqueue_post(state, post))
+    logging.info(f"Запуск приёмника Callback API на порту {Config.WEBHOOK_PORT}, путь {Config.WEBHOOK_PATH}")
+    app.run(host="0.0.0.0", port=Config.WEBHOOK_PORT)
+
+# Категория и подписи одного поста для разбора старой стены
+def classify_post(post):
+    photo_urls = [url for url, media_type in get_media_items(post) if media_type == "photo"]
+    captions = get_analyzer().get_image_captions(photo_urls) if photo_urls else []
+    media_url, media_type = get_media_url(post)
+    category = classify_media(post.get("text", ""), captions if media_url else None, media_type)
+    return {"media_type": media_type, "captions": captions, "category": category}
+
+# Разбор всей стены группы (например, новой студии). output="report" — только
+# файл с категориями постов, output="send" — ещё и комплименты к ещё не
+# отправленным постам, по порядку от старых к новым через обычную рассылку.
+def run_backfill(state, group_id, output="report", limit=None):
+    from backfill import WallBackfill
+    get_analyzer().reserve_callers(Config.BACKFILL_WORKERS)
+    backfill = WallBackfill(group_id, classify_post, os.path.join(Config.BACKFILL_DIR, f"{group_id}.jsonl"),
+                            page_size=Config.BACKFILL_PAGE_SIZE, workers=Config.BACKFILL_WORKERS,
+                            vk_rate=Config.VK_REQUESTS_PER_SECOND, limit=limit)
+    rows = backfill.run()
+    categories = {}
+    for row in rows:
+        categories[row["category"]] = categories.get(row["category"], 0) + 1
+    logging.info(f"Разбор стены группы {group_id} завершён: {len(rows)} постов, по категориям {categories}, "
+                 f"отчёт в {backfill.checkpoint_path}")
+    if output != "send":
+        return rows
+    for row in reversed(rows):
+        if row.get("sent"):
+            continue
+        if row["post_key"] in state["processed_posts"]:
+            # Комплимент к посту уже отправил обычный опрос стены
+            backfill.mark_sent(row)
+            continue
+        post = backfill.posts[row["post_key"]]
+        with state_store.lock:
+            message = compose_message(post, row["captions"], state)
+        report = send_telegram_message(message)
+        if report and any(result["ok"] for result in report.values()):
+            with state_store.lock:
+                state["processed_posts"][row["post_key"]] = True
+                state_store.add_processed(row["post_key"])
+                state_store.maybe_flush()
+            backfill.mark_sent(row)
+    return rows
+
+# Режим Bots Long Poll: события о новых постах без публичного адреса.
+# ts каждой группы хранится в состоянии, пропуски добираются обычным опросом стены.
+def run_longpoll(state):
+    from longpoll import LongPollListener
+
+    def load_ts(group_id):
+        return state.get("longpoll_ts", {}).get(group_id)
+
+    def save_ts(group_id, ts):
+        with state_store.lock:
+            state.setdefault("longpoll_ts", {})[group_id] = ts
+            state_store.mark_dirty("longpoll_ts")
+            state_store.maybe_flush()
+
+    def catch_up():
+        # Блокировку состояния check_new_post берёт сам, только на время отметки постов
+        for post in check_new_post(state):
+            post_queue.put((post, False))
+
+    threading.Thread(target=post_worker, args=(state,), daemon=True, name="post-worker").start()
+    threading.Thread(target=run_scheduler, args=(state, False), daemon=True, name="scheduler").start()
+    catch_up()
+    listeners = []
+    for group_id in Config.GROUP_IDS:
+        listener = LongPollListener(group_id, lambda post: enqueue_post(state, post), load_ts, save_ts,
+                                    on_gap=catch_up, wait=Config.LONGPOLL_WAIT)
+        thread = threading.Thread(target=listener.run_forever, daemon=True, name=f"longpoll{group_id}")
+        thread.start()
+        listeners.append(thread)
+    logging.info(f"Long Poll запущен для групп: {Config.GROUP_IDS}")
+    for thread in listeners:
+        thread.join()
 
 if __name__ == "__main__":
     logging.info("Запуск бота... Python версия: " + sys.version)
     logging.info("Текущий каталог: " + os.getcwd())
-    logging.info("Доступные файлы: " + str(os.listdir('.')))
     state = load_state()
     logging.info("Состояние загружено успешно")
     parser = argparse.ArgumentParser()
     parser.add_argument('--compliment-type', type=str, help='Type of compliment to send')
+    parser.add_argument('--webhook', action='store_true', help='Receive new posts via VK Callback API')
+    parser.add_argument('--longpoll', action='store_true', help='Receive new posts via VK Bots Long Poll API')
+    parser.add_argument('--once', action='store_true', help='Check for new posts once and exit')
+    parser.add_argument('--backfill', type=str, metavar='GROUP_ID', help='Classify the whole wall of a group and exit')
+    parser.add_argument('--backfill-output', choices=['report', 'send'], default='report',
+                        help='Only write the report, or also send compliments for the backfilled posts')
+    parser.add_argument('--backfill-limit', type=int, help='Only the newest N posts of the wall')
     args = parser.parse_args()
-    if args.compliment_type:
-        job(state, args.compliment_type)
-    else:
-        run_scheduler(state)
+    one_shot = bool(args.compliment_type or args.once or args.backfill)
+    if not one_shot and Config.METRICS_PORT:
+        metrics.start_http_server(Config.METRICS_PORT, Config.METRICS_HOST)
+    if Config.TENANTS_FILE and (args.webhook or args.longpoll or args.backfill):
+        logging.warning("TENANTS_FILE работает только с опросом стен, --webhook/--longpoll/--backfill "
+                        "используют группы и чаты из переменных окружения")
+    try:
+        if Config.TENANTS_FILE and not (args.webhook or args.longpoll or args.backfill):
+            run_tenants(state, once=args.once, compliment_type=args.compliment_type)
+        elif args.compliment_type:
+            job(state, args.compliment_type)
+        elif args.once:
+            job(state)
+        elif args.backfill:
+            run_backfill(state, args.backfill, args.backfill_output, args.backfill_limit)
+        elif args.webhook:
+            run_webhook(state)
+        elif args.longpoll:
+            run_longpoll(state)
+        else:
+            run_scheduler(state)
+    finally:
+        state_store.flush()
+        if one_shot and Config.METRICS_FILE:
+            metrics.dump_json(Config.METRICS_FILE)
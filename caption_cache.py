@@ -0,0 +1,93 @@
+import time
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+
+
+# Двухуровневый кэш подписей к изображениям: LRU в памяти перед SQLite на
+# диске. Запись хранит исходную английскую подпись и её перевод и доступна
+# по нескольким ключам (URL фото и хэш содержимого). Устаревшие по ttl записи
+# не возвращаются, а размер обоих уровней ограничен.
+class CaptionCache:
+
+    def __init__(self, path, ttl=30 * 86400, memory_size=256, disk_size=10000):
+        self.path = path
+        self.ttl = ttl
+        self.memory_size = memory_size
+        self.disk_size = disk_size
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS captions (
+                key TEXT PRIMARY KEY,
+                caption TEXT NOT NULL,
+                translated TEXT NOT NULL,
+                created_at INTEGER NOT NULL,
+                accessed_at INTEGER NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS captions_accessed ON captions (accessed_at)")
+        self._conn.commit()
+
+    # count_miss=False — промах не учитывается: за ним последует ещё один
+    # поиск того же изображения по другому ключу (URL, затем хэш)
+    def get(self, key, count_miss=True):
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry and now - entry["created_at"] < self.ttl:
+                self._memory.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return entry
+            row = self._conn.execute(
+                "SELECT caption, translated, created_at FROM captions WHERE key = ?", (key,)).fetchone()
+            if row and now - row[2] < self.ttl:
+                with self._conn:
+                    self._conn.execute("UPDATE captions SET accessed_at = ? WHERE key = ?", (int(now), key))
+                entry = {"caption": row[0], "translated": row[1], "created_at": row[2]}
+                self._remember(key, entry)
+                self.stats["disk_hits"] += 1
+                return entry
+            self._memory.pop(key, None)
+            if count_miss:
+                self.stats["misses"] += 1
+            return None
+
+    def count_miss(self):
+        with self._lock:
+            self.stats["misses"] += 1
+
+    def put(self, keys, caption, translated):
+        now = int(time.time())
+        entry = {"caption": caption, "translated": translated, "created_at": now}
+        with self._lock:
+            with self._conn:
+                self._conn.executemany("INSERT OR REPLACE INTO captions VALUES (?, ?, ?, ?, ?)",
+                                       [(key, caption, translated, now, now) for key in keys])
+                self._evict_disk(now)
+            for key in keys:
+                self._remember(key, entry)
+
+    def _remember(self, key, entry):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    def _evict_disk(self, now):
+        self._conn.execute("DELETE FROM captions WHERE created_at < ?", (now - self.ttl,))
+        excess = self._conn.execute("SELECT COUNT(*) FROM captions").fetchone()[0] - self.disk_size
+        if excess > 0:
+            self._conn.execute(
+                "DELETE FROM captions WHERE key IN (SELECT key FROM captions ORDER BY accessed_at LIMIT ?)",
+                (excess,))
+            logging.info(f"Из кэша подписей удалено записей: {excess}")
+
+    def hit_rate(self):
+        hits = self.stats["memory_hits"] + self.stats["disk_hits"]
+        total = hits + self.stats["misses"]
+        return hits / total if total else 0.0
@@ -0,0 +1,86 @@
+import time
+import threading
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+# Предохранитель для внешнего сервиса.
+# После failure_threshold ошибок подряд сервис отключается на reset_timeout
+# секунд, затем пропускается один пробный запрос: успех замыкает цепь,
+# ошибка снова размыкает. Заодно считаются EWMA задержки и доли успехов,
+# по которым выбирается самый быстрый здоровый сервис.
+class CircuitBreaker:
+
+    def __init__(self, name, failure_threshold=3, reset_timeout=60, alpha=0.3):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.alpha = alpha
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0
+        self.ewma_latency = None
+        self.success_rate = 1.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = HALF_OPEN
+            if self.state == HALF_OPEN:
+                if self._probing:
+                    return False
+                self._probing = True
+                return True
+            return self.state == CLOSED
+
+    def record_success(self, latency):
+        with self._lock:
+            self._observe(latency, 1.0)
+            self.failures = 0
+            self.state = CLOSED
+            self._probing = False
+
+    def record_failure(self, latency):
+        with self._lock:
+            self._observe(latency, 0.0)
+            self.failures += 1
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+            self._probing = False
+
+    # Вызов отменён до ответа (проиграл хедж или вышел срок): о сервисе он
+    # ничего не говорит, поэтому ошибка не считается, но пробный запрос
+    # полуоткрытой цепи освобождается — иначе allow() больше не пропустит ни одного
+    def release(self):
+        with self._lock:
+            self._probing = False
+
+    def _observe(self, latency, success):
+        if self.ewma_latency is None:
+            self.ewma_latency = latency
+        else:
+            self.ewma_latency += self.alpha * (latency - self.ewma_latency)
+        self.success_rate += self.alpha * (success - self.success_rate)
+
+    # Чем меньше, тем раньше пробуем сервис: сначала замкнутые, затем по
+    # ожидаемому времени до успешного ответа. Ещё не вызванный сервис идёт
+    # после измеренных (сортировка устойчива, поэтому без данных остаётся
+    # порядок из настроек), иначе запасной сервис обгонял бы основной после
+    # первого же успешного вызова основного.
+    def rank(self):
+        latency = self.ewma_latency if self.ewma_latency is not None else float("inf")
+        return (self.state != CLOSED, latency / max(self.success_rate, 0.05))
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "state": self.state,
+                "failures": self.failures,
+                "ewma_latency": self.ewma_latency,
+                "success_rate": round(self.success_rate, 3)
+            }
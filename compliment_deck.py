@@ -0,0 +1,67 @@
+import random
+import bisect
+import hashlib
+from collections import OrderedDict
+
+SEED_BITS = 32
+
+
+def _position_key(seed, compliment):
+    digest = hashlib.blake2b(compliment.encode("utf-8"), digest_size=8, key=seed.to_bytes(8, "big"))
+    return digest.hexdigest()
+
+
+# Колода комплиментов без повторений внутри цикла.
+# Порядок колоды задаётся ключом blake2b(seed, текст): комплименты идут по
+# возрастанию ключа. В состоянии хранится только {"seed": ..., "last": ...} —
+# seed цикла и ключ последнего выданного комплимента, поэтому правка
+# compliments.py колоду не сбрасывает: новые комплименты с ключом больше
+# last выпадут ещё в этом цикле, удалённые просто исчезают из порядка.
+# Порядок строится один раз за цикл, следующий комплимент берётся за O(1)
+# по запомненной позиции (или бинарным поиском после перезапуска).
+# Порядки последних max_orders seed хранятся, поэтому одну колоду могут
+# делить состояния разных студий без пересортировки на каждом выборе.
+class ComplimentDeck:
+
+    def __init__(self, compliments, max_orders=1024):
+        self.compliments = compliments
+        self.max_orders = max_orders
+        self._orders = OrderedDict()  # seed -> (ключи, комплименты) по возрастанию ключа
+        self._position = None  # (seed, last, индекс) последней выдачи
+
+    def _order(self, seed):
+        order = self._orders.get(seed)
+        if order is not None:
+            self._orders.move_to_end(seed)
+            return order
+        ordered = sorted({_position_key(seed, comp): comp for comp in self.compliments}.items())
+        order = self._orders[seed] = ([key for key, _ in ordered], [comp for _, comp in ordered])
+        if len(self._orders) > self.max_orders:
+            self._orders.popitem(last=False)
+        return order
+
+    def _next_index(self, seed, keys, last):
+        if last is None:
+            return 0
+        if self._position and self._position[:2] == (seed, last):
+            return self._position[2] + 1
+        return bisect.bisect_right(keys, last)
+
+    # Возвращает (комплимент, новое состояние колоды, начался ли новый цикл)
+    def draw(self, deck_state):
+        if not self.compliments:
+            raise ValueError("empty deck")
+        seed = deck_state.get("seed") if deck_state else None
+        last = deck_state.get("last") if deck_state else None
+        restarted = False
+        if seed is None:
+            seed = random.getrandbits(SEED_BITS)
+        keys, items = self._order(seed)
+        index = self._next_index(seed, keys, last)
+        if index >= len(items):
+            restarted = True
+            seed = random.getrandbits(SEED_BITS)
+            keys, items = self._order(seed)
+            index = 0
+        self._position = (seed, keys[index], index)
+        return items[index], {"seed": seed, "last": keys[index]}, restarted
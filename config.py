@@ -2,10 +2,60 @@ import os
 
 class Config:
     VK_TOKEN = os.getenv("VK_TOKEN")  # Токен VK, должен быть в Secrets
+    VK_API_URL = os.getenv("VK_API_URL", "https://api.vk.com/method/")  # Адрес VK API (можно подменить заглушкой)
     GROUP_ID = os.getenv("GROUP_ID")  # Новый ID группы (замени на свой)
+    GROUP_IDS = [g.strip() for g in (GROUP_ID or "").split(",") if g.strip()]  # Можно указать несколько групп через запятую
+    WALL_PAGE_SIZE = int(os.getenv("WALL_PAGE_SIZE", "10"))  # Сколько постов запрашивать за одну страницу wall.get
     TELEGRAM_TOKEN = os.getenv("TELEGRAM_TOKEN")  # Токен Telegram, должен быть в Secrets
+    TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "https://api.telegram.org")  # Адрес Bot API (можно подменить заглушкой)
     CHAT_ID_TRACKING = os.getenv("CHAT_ID")  # Твой CHAT_ID для отслеживания
     CHAT_ID_HER = os.getenv("CHAT_ID_HER")  # Её CHAT_ID для комплиментов
     HF_TOKEN = os.getenv("HF_TOKEN")  # Токен Hugging Face, должен быть в Secrets
     YNDX_API_KEY = os.getenv("YNDX_API_KEY")  # Ключ Yandex, должен быть в Secrets
-    STATE_FILE = "bot_state.json"  # Это можно оставить
\ No newline at end of file
+    STATE_FILE = "bot_state.json"  # Это можно оставить
+    STATE_BACKEND = os.getenv("STATE_BACKEND", "json")  # Хранилище состояния: json или sqlite
+    STATE_DB = os.getenv("STATE_DB", "bot_state.db")  # Файл базы для STATE_BACKEND=sqlite
+    STATE_RETENTION_DAYS = int(os.getenv("STATE_RETENTION_DAYS", "90"))  # Сколько дней хранить ID обработанных постов
+    STATE_FLUSH_INTERVAL = int(os.getenv("STATE_FLUSH_INTERVAL", "300"))  # Как часто сбрасывать состояние на диск, сек
+    STATE_GIT_SYNC = os.getenv("STATE_GIT_SYNC", "1") == "1"  # Коммитить и пушить состояние в репозиторий при сбросе
+    PIPELINE_MODE = os.getenv("PIPELINE_MODE", "sync")  # sync или async (параллельная обработка новых постов)
+    PIPELINE_DOWNLOAD_CONCURRENCY = int(os.getenv("PIPELINE_DOWNLOAD_CONCURRENCY", "4"))  # Одновременных скачиваний изображений
+    PIPELINE_CAPTION_CONCURRENCY = int(os.getenv("PIPELINE_CAPTION_CONCURRENCY", "2"))  # Одновременных запросов подписи
+    PIPELINE_TRANSLATE_CONCURRENCY = int(os.getenv("PIPELINE_TRANSLATE_CONCURRENCY", "4"))  # Одновременных запросов перевода
+    HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "4"))  # Размер пула keep-alive соединений на каждый хост
+    EXTRA_CHAT_IDS = [c.strip() for c in os.getenv("EXTRA_CHAT_IDS", "").split(",") if c.strip()]  # Дополнительные получатели через запятую
+    TELEGRAM_GLOBAL_RATE = float(os.getenv("TELEGRAM_GLOBAL_RATE", "30"))  # Общий лимит сообщений в секунду
+    TELEGRAM_CHAT_RATE = float(os.getenv("TELEGRAM_CHAT_RATE", "1"))  # Лимит сообщений в секунду на один чат
+    TELEGRAM_BROADCAST_WORKERS = int(os.getenv("TELEGRAM_BROADCAST_WORKERS", "8"))  # Сколько чатов отправлять одновременно
+    CAPTION_CACHE_FILE = os.getenv("CAPTION_CACHE_FILE", "caption_cache.db")  # Кэш подписей к изображениям на диске
+    CAPTION_CACHE_TTL = int(os.getenv("CAPTION_CACHE_TTL", str(30 * 86400)))  # Время жизни подписи в кэше, сек
+    CAPTION_CACHE_MEMORY_SIZE = int(os.getenv("CAPTION_CACHE_MEMORY_SIZE", "256"))  # Записей в памяти
+    CAPTION_CACHE_DISK_SIZE = int(os.getenv("CAPTION_CACHE_DISK_SIZE", "10000"))  # Записей на диске
+    TRANSLATION_CACHE_FILE = os.getenv("TRANSLATION_CACHE_FILE", "translation_cache.db")  # Память переводов подписей
+    CAPTION_HEDGE_DELAY = float(os.getenv("CAPTION_HEDGE_DELAY", "3"))  # Через сколько секунд без ответа запускать запасной сервис подписи
+    CAPTION_DEADLINE = float(os.getenv("CAPTION_DEADLINE", "20"))  # Общий лимит времени на получение подписи, сек
+    BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "3"))  # Ошибок подряд до отключения сервиса
+    BREAKER_RESET_TIMEOUT = float(os.getenv("BREAKER_RESET_TIMEOUT", "60"))  # Через сколько секунд пробовать отключённый сервис снова
+    IMAGE_MAX_BYTES = int(os.getenv("IMAGE_MAX_BYTES", str(5 * 1024 * 1024)))  # Максимальный размер скачиваемого изображения
+    CAPTION_BACKENDS = [b.strip() for b in os.getenv("CAPTION_BACKENDS", "remote").split(",") if b.strip()]  # remote, local или оба по порядку
+    MAX_PARALLEL_IMAGES = int(os.getenv("MAX_PARALLEL_IMAGES", "4"))  # Сколько фото одного поста обрабатывать одновременно
+    VK_CONFIRMATION_CODE = os.getenv("VK_CONFIRMATION_CODE")  # Строка подтверждения сервера из настроек Callback API
+    VK_CALLBACK_SECRET = os.getenv("VK_CALLBACK_SECRET")  # Секретный ключ Callback API
+    WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/vk/callback")  # Путь приёмника Callback API
+    WEBHOOK_PORT = int(os.getenv("PORT", "8080"))  # Порт приёмника Callback API
+    WEBHOOK_METRICS = os.getenv("WEBHOOK_METRICS", "0") == "1"  # Отдавать /metrics на публичном порту приёмника
+    LONGPOLL_WAIT = int(os.getenv("LONGPOLL_WAIT", "25"))  # Сколько секунд сервер Long Poll держит запрос
+    ARTIFACT_FILE = os.getenv("ARTIFACT_FILE", ".cache/bot_artifacts.pickle")  # Собранные заранее ключевые слова и комплименты
+    METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))  # Порт /metrics в формате Prometheus для постоянных режимов, 0 — выключено
+    METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")  # Адрес для /metrics; 0.0.0.0 — доступен снаружи
+    METRICS_FILE = os.getenv("METRICS_FILE", "metrics.json")  # Куда сохранять метрики после разового запуска, пусто — не сохранять
+    LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")  # Уровень логирования
+    LOG_FORMAT = os.getenv("LOG_FORMAT", "text")  # text или json (одна запись — одна строка JSON)
+    LOG_MAX_PAYLOAD = int(os.getenv("LOG_MAX_PAYLOAD", "500"))  # Сколько символов ответа VK, текста поста и т.п. попадает в лог
+    LOG_SAMPLE_RATES = os.getenv("LOG_SAMPLE_RATES", "")  # Доля записей по событиям, например "vk_response=0.1,vk_post=0.2"
+    BACKFILL_DIR = os.getenv("BACKFILL_DIR", "backfill")  # Файлы прогресса и отчёты разбора стены (--backfill)
+    BACKFILL_WORKERS = int(os.getenv("BACKFILL_WORKERS", "8"))  # Сколько постов разбирать одновременно
+    BACKFILL_PAGE_SIZE = int(os.getenv("BACKFILL_PAGE_SIZE", "100"))  # Постов на страницу wall.get (не больше 100)
+    VK_REQUESTS_PER_SECOND = float(os.getenv("VK_REQUESTS_PER_SECOND", "3"))  # Лимит запросов к VK API при разборе стены
+    TENANTS_FILE = os.getenv("TENANTS_FILE", "")  # JSON со студиями (группы, получатели, комплименты); пусто — одна студия из переменных выше
+    TENANT_WORKERS = int(os.getenv("TENANT_WORKERS", "4"))  # Потоков в общем пуле обработки постов всех студий
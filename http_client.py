@@ -0,0 +1,84 @@
+import logging
+import threading
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from config import Config
+
+# Таймауты и повторы для каждого хоста. Повторяем только ошибки соединения
+# и 5xx от шлюза; POST повторяется лишь там, где запрос идемпотентен.
+HOST_POLICIES = {
+    "api.vk.com": {"timeout": 10, "retries": 2, "retry_post": True},
+    "api.telegram.org": {"timeout": 10, "retries": 1, "retry_post": False},
+    "api-inference.huggingface.co": {"timeout": 10, "retries": 0, "retry_post": False},
+    "api.ttt.tf": {"timeout": 15, "retries": 0, "retry_post": False},
+    "translate.googleapis.com": {"timeout": 8, "retries": 1, "retry_post": False},
+    "libretranslate.de": {"timeout": 8, "retries": 1, "retry_post": True},
+}
+DEFAULT_POLICY = {"timeout": 10, "retries": 1, "retry_post": False}
+
+_sessions = {}
+_lock = threading.Lock()
+
+
+def _policy(host):
+    return HOST_POLICIES.get(host, DEFAULT_POLICY)
+
+
+def _create_session(host):
+    policy = _policy(host)
+    methods = Retry.DEFAULT_ALLOWED_METHODS | {"POST"} if policy["retry_post"] else Retry.DEFAULT_ALLOWED_METHODS
+    retry = Retry(total=policy["retries"], connect=policy["retries"], read=0,
+                  status=policy["retries"], status_forcelist=(502, 503, 504),
+                  allowed_methods=methods, backoff_factor=0.5,
+                  raise_on_status=False)
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=Config.HTTP_POOL_SIZE, max_retries=retry)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    logging.info(f"Создан пул соединений для {host} (размер {Config.HTTP_POOL_SIZE})")
+    return session
+
+
+# Одна keep-alive сессия на хост: TCP+TLS поднимается один раз и переиспользуется
+def session_for(url):
+    host = urlsplit(url).hostname or ""
+    session = _sessions.get(host)
+    if session is None:
+        with _lock:
+            session = _sessions.get(host)
+            if session is None:
+                session = _sessions[host] = _create_session(host)
+    return session
+
+
+def request(method, url, **kwargs):
+    kwargs.setdefault("timeout", timeout_for(url))
+    return session_for(url).request(method, url, **kwargs)
+
+
+def get(url, **kwargs):
+    return request("GET", url, **kwargs)
+
+
+def post(url, **kwargs):
+    return request("POST", url, **kwargs)
+
+
+def timeout_for(url):
+    return _policy(urlsplit(url).hostname or "")["timeout"]
+
+
+# Сессия aiohttp для асинхронного конвейера с тем же размером пула на хост
+def create_async_session():
+    import aiohttp
+    connector = aiohttp.TCPConnector(limit_per_host=Config.HTTP_POOL_SIZE, keepalive_timeout=60)
+    return aiohttp.ClientSession(connector=connector)
+
+
+def close():
+    with _lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
@@ -1,14 +1,81 @@
-import requests
+import time
+import asyncio
+import hashlib
+import http_client
 import logging
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from circuit_breaker import CircuitBreaker
+from metrics import registry as metrics
+from structured_log import payload
 
 logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s - %(levelname)s - %(message)s')
 
+HF_URL = "https://api-inference.huggingface.co/models/Salesforce/blip-image-captioning-base"
+ALTERNATIVE_URL = "https://api.ttt.tf/v1/caption"
+GOOGLE_TRANSLATE_URL = "https://translate.googleapis.com/translate_a/single"
+LIBRETRANSLATE_URL = "https://libretranslate.de/translate"
+BLIP_INPUT_SIZE = 384
+CAPTION_PROVIDERS = ["hugging_face", "alternative"]
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+
+# Подпись от удалённых сервисов (Hugging Face и запасной API) с переводом
+class RemoteCaptionBackend:
+    name = "remote"
+    # BLIP-base всё равно сжимает вход до 384px, больше скачивать незачем
+    analysis_size = BLIP_INPUT_SIZE
+
+    def __init__(self, analyzer):
+        self.analyzer = analyzer
+
+    def describe(self, image_data):
+        caption = self.analyzer._caption_hedged(image_data)
+        if not caption:
+            return None
+        logging.info("Подпись для перевода: %s", payload(caption), extra={"event": "caption"})
+        return caption, self.analyzer._translate(caption)
+
+    async def describe_async(self, session, image_data, limits):
+        async with limits.get("caption", nullcontext()):
+            caption = await self.analyzer._caption_hedged_async(session, image_data)
+        if not caption:
+            return None
+        logging.info("Подпись для перевода: %s", payload(caption), extra={"event": "caption"})
+        async with limits.get("translate", nullcontext()):
+            return caption, await self.analyzer._translate_async(session, caption)
+
 
 class ImageAnalyzer:
 
-    def __init__(self, hf_token, yndx_api_key):
+    def __init__(self, hf_token, yndx_api_key, cache=None, translations=None,
+                 hedge_delay=3.0, caption_deadline=20.0,
+                 breaker_threshold=3, breaker_reset_timeout=60,
+                 max_image_bytes=5 * 1024 * 1024, max_parallel_images=4):
         self.hf_token = hf_token
+        self.max_image_bytes = max_image_bytes
+        # Если основной сервис подписи не ответил за hedge_delay секунд,
+        # параллельно запускается следующий; всё вместе укладывается в caption_deadline
+        self.hedge_delay = hedge_delay
+        self.caption_deadline = caption_deadline
+        # По потоку на каждый сервис для каждого одновременно обрабатываемого
+        # фото: зависший основной сервис не занимает места запасного
+        self.max_parallel_images = max_parallel_images
+        self._caption_workers = max_parallel_images * len(CAPTION_PROVIDERS)
+        self._executor = ThreadPoolExecutor(max_workers=self._caption_workers, thread_name_prefix="caption")
+        # Отдельный пул для параллельной обработки нескольких фото одного поста
+        self._images_executor = ThreadPoolExecutor(max_workers=max_parallel_images, thread_name_prefix="image")
+        # Предохранитель на каждый внешний сервис
+        self.breakers = {
+            name: CircuitBreaker(name, breaker_threshold, breaker_reset_timeout)
+            for name in CAPTION_PROVIDERS + ["google_translate", "libretranslate"]
+        }
+        # Способы описать изображение, пробуются по порядку. Каждый возвращает
+        # (исходная подпись, подпись на русском) или None
+        self.backends = [RemoteCaptionBackend(self)]
+        self.cache = cache  # CaptionCache или None
+        self.translations = translations  # TranslationCache или None
         self.yndx_api_key = yndx_api_key  # Оставляем для совместимости, но не используем
         self.translation_dict = {
             "tattoo": "татуировка",
@@ -21,43 +88,268 @@ class ImageAnalyzer:
             "line": "линия"
         }
 
+    # Сторона копии фото для скачивания: наибольший вход среди выбранных
+    # способов описания (с одним локальным — 256px, с сервисами — 384px)
+    @property
+    def target_resolution(self):
+        return max((backend.analysis_size for backend in self.backends), default=BLIP_INPUT_SIZE)
+
+    # callers — сколько потоков вызывающего кода одновременно подписывают фото
+    # (разбор стены, пул студий). Фото из одного поста такой поток подписывает
+    # сам, поэтому пул подписей растёт: у каждого фото в работе по потоку на
+    # сервис. Вызывать до начала обработки.
+    def reserve_callers(self, callers):
+        workers = (self.max_parallel_images + callers) * len(CAPTION_PROVIDERS)
+        if workers <= self._caption_workers:
+            return
+        previous = self._executor
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="caption")
+        self._caption_workers = workers
+        previous.shutdown(wait=False)
+        logging.info(f"Пул подписей расширен до {workers} потоков")
+
+    # Подписи ко всем фото поста, параллельно, не больше max_parallel_images
+    # одновременно; порядок совпадает с порядком image_urls
+    def get_image_captions(self, image_urls):
+        if len(image_urls) <= 1:
+            return [self.get_image_caption(url) for url in image_urls]
+        return list(self._images_executor.map(self.get_image_caption, image_urls))
+
+    async def get_image_captions_async(self, session, image_urls, limits=None):
+        return list(await asyncio.gather(
+            *(self.get_image_caption_async(session, url, limits) for url in image_urls)))
+
     def get_image_caption(self, image_url):
-        logging.info(f"Скачивание изображения: {image_url}")
+        cached = self._cached_caption(f"url:{image_url}", final=False)
+        if cached:
+            return cached
+        image_data = self._download(image_url)
+        if image_data is None:
+            if self.cache:
+                self.cache.count_miss()
+            return "татуировка, эскиз"
+        keys = [f"url:{image_url}", f"sha256:{hashlib.sha256(image_data).hexdigest()}"]
+        cached = self._cached_caption(keys[1], alias=keys[0])
+        if cached:
+            return cached
+
+        for index, backend in enumerate(self.backends):
+            described = backend.describe(image_data)
+            if described:
+                if index:
+                    metrics.inc("bot_fallback_total", stage="caption_backend", provider=backend.name)
+                caption, translated_caption = described
+                self._cache_caption(keys, caption, translated_caption)
+                return translated_caption if translated_caption else "татуировка, эскиз"
+        logging.warning(
+            "Не удалось получить подпись, возвращаем значение по умолчанию"
+        )
+        metrics.inc("bot_fallback_total", stage="caption_backend", provider="default")
+        return "татуировка, эскиз"
+
+    # Потоковое скачивание изображения с ограничением размера. Куски
+    # склеиваются один раз, и этот же объект bytes уходит во все сервисы
+    # подписи и в хэш кэша. Возвращает None, если скачать не удалось.
+    @metrics.timed("bot_stage_duration_seconds", stage="download")
+    def _download(self, image_url):
+        logging.info("Скачивание изображения: %s", image_url, extra={"event": "download"})
         try:
-            response = requests.get(image_url, timeout=10)
-            if response.status_code != 200:
-                logging.error(
-                    f"Не удалось скачать изображение: {response.status_code}")
-                return "татуировка, эскиз"
-            image_data = response.content
+            with http_client.get(image_url, stream=True) as response:
+                error = self._check_image_response(response.status_code, response.headers)
+                if error:
+                    logging.error(f"Не удалось скачать изображение: {error}")
+                    return None
+                chunks, size = [], 0
+                for chunk in response.iter_content(DOWNLOAD_CHUNK_SIZE):
+                    chunks.append(chunk)
+                    size += len(chunk)
+                    if size > self.max_image_bytes:
+                        logging.error(f"Изображение больше {self.max_image_bytes} байт, загрузка прервана")
+                        return None
+                return b"".join(chunks)
         except Exception as e:
             logging.error(f"Ошибка загрузки изображения: {e}")
-            return "татуировка, эскиз"
+            return None
 
-        caption = self._try_hugging_face(image_data)
-        if not caption:
-            caption = self._try_alternative(image_data)
-        if not caption:
-            logging.warning(
-                "Не удалось получить подпись, возвращаем значение по умолчанию"
-            )
-            return "татуировка, эскиз"
+    @metrics.timed("bot_stage_duration_seconds", stage="download")
+    async def _download_async(self, session, image_url):
+        logging.info("Скачивание изображения: %s", image_url, extra={"event": "download"})
+        try:
+            async with session.get(image_url, timeout=self._timeout(image_url)) as response:
+                error = self._check_image_response(response.status, response.headers)
+                if error:
+                    logging.error(f"Не удалось скачать изображение: {error}")
+                    return None
+                chunks, size = [], 0
+                async for chunk in response.content.iter_chunked(DOWNLOAD_CHUNK_SIZE):
+                    chunks.append(chunk)
+                    size += len(chunk)
+                    if size > self.max_image_bytes:
+                        logging.error(f"Изображение больше {self.max_image_bytes} байт, загрузка прервана")
+                        return None
+                return b"".join(chunks)
+        except Exception as e:
+            logging.error(f"Ошибка загрузки изображения: {e}")
+            return None
+
+    def _check_image_response(self, status, headers):
+        if status != 200:
+            return status
+        content_type = headers.get("Content-Type", "")
+        if not content_type.startswith("image/"):
+            return f"неожиданный Content-Type {content_type!r}"
+        length = headers.get("Content-Length")
+        if length and length.isdigit() and int(length) > self.max_image_bytes:
+            return f"размер {length} байт больше {self.max_image_bytes}"
+        return None
+
+    # Переведённая подпись из кэша; alias — дополнительный ключ, под которым
+    # запомнить найденную запись (URL для записи, найденной по хэшу).
+    # final=False — промах не считается, будет ещё поиск по хэшу: на одно
+    # изображение приходится одно обращение к кэшу в статистике
+    def _cached_caption(self, key, alias=None, final=True):
+        if not self.cache:
+            return None
+        entry = self.cache.get(key, count_miss=final)
+        if not entry:
+            return None
+        logging.info("Подпись взята из кэша (%s): %s", key, payload(entry['translated']), extra={"event": "caption_cache"})
+        if alias:
+            self.cache.put([alias], entry["caption"], entry["translated"])
+        return entry["translated"]
+
+    def _cache_caption(self, keys, caption, translated_caption):
+        if self.cache and translated_caption:
+            self.cache.put(keys, caption, translated_caption)
+
+    # Имена сервисов в порядке попытки: здоровые и быстрые первыми
+    def _ranked(self, providers):
+        return sorted(providers, key=lambda name: self.breakers[name].rank())
+
+    # Вызов сервиса через его предохранитель; пустой результат считается ошибкой
+    def _call_provider(self, name, function, *args):
+        breaker = self.breakers[name]
+        if not breaker.allow():
+            logging.info(f"Сервис {name} временно отключён предохранителем")
+            metrics.inc("bot_provider_skipped_total", provider=name)
+            return None
+        started = time.monotonic()
+        result = function(*args)
+        self._record_call(breaker, name, result, time.monotonic() - started)
+        return result
+
+    async def _call_provider_async(self, name, function, *args):
+        breaker = self.breakers[name]
+        if not breaker.allow():
+            logging.info(f"Сервис {name} временно отключён предохранителем")
+            metrics.inc("bot_provider_skipped_total", provider=name)
+            return None
+        started = time.monotonic()
+        try:
+            result = await function(*args)
+        except asyncio.CancelledError:
+            breaker.release()
+            raise
+        self._record_call(breaker, name, result, time.monotonic() - started)
+        return result
+
+    def _record_call(self, breaker, name, result, elapsed):
+        if result:
+            breaker.record_success(elapsed)
+        else:
+            breaker.record_failure(elapsed)
+        metrics.observe("bot_provider_duration_seconds", elapsed, provider=name,
+                        outcome="success" if result else "failure")
+
+    # Состояние предохранителей для просмотра: {сервис: состояние и статистика}
+    def breaker_state(self):
+        return {name: breaker.snapshot() for name, breaker in self.breakers.items()}
+
+    # Результат дал не первый по порядку сервис — считаем это переходом на запасной
+    @staticmethod
+    def _count_fallback(stage, name, order):
+        if name != order[0]:
+            metrics.inc("bot_fallback_total", stage=stage, provider=name)
 
-        logging.info(f"Подпись для перевода: {caption}")
-        translated_caption = self._translate(caption)
-        return translated_caption if translated_caption else "татуировка, эскиз"
+    # Хеджированный запрос подписи: сервисы запускаются по очереди с задержкой
+    # hedge_delay (или сразу, если предыдущий уже ответил неудачей), берётся
+    # первая непустая подпись. Потоки нельзя прервать, поэтому оставшиеся
+    # запросы просто отбрасываются и завершаются по своим таймаутам.
+    @metrics.timed("bot_stage_duration_seconds", stage="caption")
+    def _caption_hedged(self, image_data):
+        functions = {"hugging_face": self._try_hugging_face, "alternative": self._try_alternative}
+        order = self._ranked(functions)
+        providers = [lambda data, name=name: (name, self._call_provider(name, functions[name], data))
+                     for name in order]
+        deadline = time.monotonic() + self.caption_deadline
+        pending = set()
+        next_start = 0
+        while providers or pending:
+            now = time.monotonic()
+            if now >= deadline:
+                break
+            if providers and (not pending or now >= next_start):
+                pending.add(self._executor.submit(providers.pop(0), image_data))
+                next_start = now + self.hedge_delay
+            wake_at = min(deadline, next_start) if providers else deadline
+            done, pending = wait(pending, timeout=max(wake_at - now, 0), return_when=FIRST_COMPLETED)
+            for future in done:
+                name, caption = future.result()
+                if caption:
+                    for other in pending:
+                        other.cancel()
+                    self._count_fallback("caption", name, order)
+                    return caption
+        for future in pending:
+            future.cancel()
+        if pending:
+            logging.warning(f"Подпись не получена за {self.caption_deadline} с")
+        return None
+
+    @metrics.timed("bot_stage_duration_seconds", stage="caption")
+    async def _caption_hedged_async(self, session, image_data):
+        functions = {"hugging_face": self._try_hugging_face_async, "alternative": self._try_alternative_async}
+        order = self._ranked(functions)
+
+        async def call(name, session, data):
+            return name, await self._call_provider_async(name, functions[name], session, data)
+
+        providers = [lambda session, data, name=name: call(name, session, data) for name in order]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.caption_deadline
+        pending = set()
+        next_start = 0
+        try:
+            while providers or pending:
+                now = loop.time()
+                if now >= deadline:
+                    logging.warning(f"Подпись не получена за {self.caption_deadline} с")
+                    break
+                if providers and (not pending or now >= next_start):
+                    pending.add(asyncio.create_task(providers.pop(0)(session, image_data)))
+                    next_start = now + self.hedge_delay
+                wake_at = min(deadline, next_start) if providers else deadline
+                done, pending = await asyncio.wait(pending, timeout=max(wake_at - now, 0),
+                                                   return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    name, caption = task.result()
+                    if caption:
+                        self._count_fallback("caption", name, order)
+                        return caption
+            return None
+        finally:
+            for task in pending:
+                task.cancel()
 
     def _try_hugging_face(self, image_data):
         try:
             headers = {"Authorization": f"Bearer {self.hf_token}"}
-            url = "https://api-inference.huggingface.co/models/Salesforce/blip-image-captioning-base"
-            response = requests.post(url,
-                                     headers=headers,
-                                     data=image_data,
-                                     timeout=10)
+            response = http_client.post(HF_URL,
+                                        headers=headers,
+                                        data=image_data)
             if response.status_code == 200:
                 caption = response.json()[0]['generated_text']
-                logging.info(f"Hugging Face подпись: {caption}")
+                logging.info("Hugging Face подпись: %s", payload(caption), extra={"event": "caption"})
                 return caption
             logging.warning(
                 f"Hugging Face не сработал: {response.status_code}")
@@ -68,12 +360,11 @@ class ImageAnalyzer:
 
     def _try_alternative(self, image_data):
         try:
-            url = "https://api.ttt.tf/v1/caption"
-            response = requests.post(
-                url, files={'image': ('image.jpg', image_data)}, timeout=15)
+            response = http_client.post(
+                ALTERNATIVE_URL, files={'image': ('image.jpg', image_data)})
             if response.status_code == 200:
                 caption = response.json().get('caption', 'tattoo design')
-                logging.info(f"Alternative API подпись: {caption}")
+                logging.info("Alternative API подпись: %s", payload(caption), extra={"event": "caption"})
                 return caption
             logging.warning(
                 f"Alternative API не сработал: {response.status_code}")
@@ -83,50 +374,239 @@ class ImageAnalyzer:
             return None
 
     def _translate(self, caption):
-        # Шаг 1: Пробуем Google Translate
+        return self.translate_many([caption])[0]
+
+    # Перевод нескольких подписей: сначала кэш, затем один общий запрос к
+    # Google Translate (или LibreTranslate) на все недостающие подписи, и
+    # только если оба не сработали — внутренний словарь
+    @metrics.timed("bot_stage_duration_seconds", stage="translate")
+    def translate_many(self, captions):
+        results, missing = self._split_cached(captions)
+        if missing:
+            # Шаги 1-2: Google Translate и LibreTranslate, быстрый здоровый первым
+            translated = None
+            providers = {"google_translate": self._translate_google_many,
+                         "libretranslate": self._translate_libre_many}
+            order = self._ranked(providers)
+            for name in order:
+                translated = self._call_provider(name, providers[name], missing)
+                if translated:
+                    self._count_fallback("translate", name, order)
+                    break
+            self._store_translations(results, missing, translated)
+        return [results[caption] for caption in captions]
+
+    def _translate_google_many(self, captions):
         try:
             logging.info("Попытка перевода через Google Translate")
-            url = "https://translate.googleapis.com/translate_a/single"
-            params = {
-                "client": "gtx",
-                "sl": "en",
-                "tl": "ru",
-                "dt": "t",
-                "q": caption
-            }
-            response = requests.get(url, params=params, timeout=8)
+            response = http_client.get(GOOGLE_TRANSLATE_URL,
+                                       params=self._google_params(captions))
             if response.status_code == 200:
-                translated = ''.join(part[0] for part in response.json()[0])
-                logging.info(f"Google Translate перевод: {translated}")
+                translated = self._parse_google(response.json(), len(captions))
+                if translated is None:
+                    translated = [self._translate_google_many([caption]) for caption in captions]
+                    return None if None in translated else [result[0] for result in translated]
+                logging.info("Google Translate перевод: %s", payload(translated), extra={"event": "translate"})
                 return translated
             logging.warning(
                 f"Google Translate не сработал: {response.status_code}")
         except Exception as e:
             logging.warning(f"Ошибка Google Translate: {e}")
+        return None
 
-        # Шаг 2: Если Google не сработал, пробуем LibreTranslate
+    def _translate_libre_many(self, captions):
         try:
             logging.info("Попытка перевода через LibreTranslate")
-            url = "https://libretranslate.de/translate"
-            payload = {
-                "q": caption,
-                "source": "en",
-                "target": "ru",
-                "format": "text"
-            }
-            response = requests.post(url, json=payload, timeout=8)
+            response = http_client.post(LIBRETRANSLATE_URL,
+                                        json=self._libre_payload(captions))
             if response.status_code == 200:
-                translated = response.json()["translatedText"]
-                logging.info(f"LibreTranslate перевод: {translated}")
+                translated = self._parse_libre(response.json(), len(captions))
+                logging.info("LibreTranslate перевод: %s", payload(translated), extra={"event": "translate"})
                 return translated
             logging.warning(
                 f"LibreTranslate не сработал: {response.status_code}")
         except Exception as e:
             logging.warning(f"Ошибка LibreTranslate: {e}")
+        return None
+
+    def _split_cached(self, captions):
+        results, missing = {}, []
+        for caption in dict.fromkeys(captions):
+            cached = self.translations.get(caption) if self.translations else None
+            if cached is not None:
+                results[caption] = cached
+            else:
+                missing.append(caption)
+        return results, missing
+
+    def _store_translations(self, results, missing, translated):
+        if translated:
+            results.update(zip(missing, translated))
+            if self.translations:
+                self.translations.put_many(list(zip(missing, translated)))
+            return
+        # Шаг 3: Если ничего не сработало, используем внутренний словарь.
+        # Такой перевод не запоминаем, чтобы потом получить нормальный.
+        metrics.inc("bot_fallback_total", len(missing), stage="translate", provider="dictionary")
+        for caption in missing:
+            results[caption] = self._translate_with_dict(caption)
 
-        # Шаг 3: Если ничего не сработало, используем внутренний словарь
+    def _translate_with_dict(self, caption):
         logging.info("Перевод через внутренний словарь")
         translated = ' '.join(
             self.translation_dict.get(word.lower(), word)
             for word in caption.split())
         return translated
+
+    # Несколько подписей уходят в Google одним текстом построчно
+    @staticmethod
+    def _google_params(captions):
+        return {"client": "gtx", "sl": "en", "tl": "ru", "dt": "t", "q": "\n".join(captions)}
+
+    # None — Google склеил или разбил строки пачки: сервис исправен, но
+    # подписи нужно перевести по одной (одна подпись разобраться не может)
+    @staticmethod
+    def _parse_google(data, count):
+        text = ''.join(part[0] for part in data[0])
+        if count == 1:
+            return [text.strip()]
+        lines = text.split("\n")
+        if len(lines) != count:
+            logging.warning(f"Google Translate вернул {len(lines)} строк вместо {count}, переводим по одной")
+            return None
+        return [line.strip() for line in lines]
+
+    @staticmethod
+    def _libre_payload(captions):
+        q = captions[0] if len(captions) == 1 else captions
+        return {"q": q, "source": "en", "target": "ru", "format": "text"}
+
+    @staticmethod
+    def _parse_libre(data, count):
+        translated = data["translatedText"]
+        return [translated] if count == 1 else list(translated)
+
+    # Асинхронные версии тех же шагов для режима PIPELINE_MODE=async.
+    # session — aiohttp.ClientSession, limits — семафоры по этапам
+    # ("download", "caption", "translate"), ограничивающие параллельность.
+    async def get_image_caption_async(self, session, image_url, limits=None):
+        limits = limits or {}
+        cached = self._cached_caption(f"url:{image_url}", final=False)
+        if cached:
+            return cached
+        async with limits.get("download", nullcontext()):
+            image_data = await self._download_async(session, image_url)
+        if image_data is None:
+            if self.cache:
+                self.cache.count_miss()
+            return "татуировка, эскиз"
+        keys = [f"url:{image_url}", f"sha256:{hashlib.sha256(image_data).hexdigest()}"]
+        cached = self._cached_caption(keys[1], alias=keys[0])
+        if cached:
+            return cached
+
+        for index, backend in enumerate(self.backends):
+            described = await backend.describe_async(session, image_data, limits)
+            if described:
+                if index:
+                    metrics.inc("bot_fallback_total", stage="caption_backend", provider=backend.name)
+                caption, translated_caption = described
+                self._cache_caption(keys, caption, translated_caption)
+                return translated_caption if translated_caption else "татуировка, эскиз"
+        logging.warning(
+            "Не удалось получить подпись, возвращаем значение по умолчанию"
+        )
+        metrics.inc("bot_fallback_total", stage="caption_backend", provider="default")
+        return "татуировка, эскиз"
+
+    async def _try_hugging_face_async(self, session, image_data):
+        try:
+            headers = {"Authorization": f"Bearer {self.hf_token}"}
+            async with session.post(HF_URL,
+                                    headers=headers,
+                                    data=image_data,
+                                    timeout=self._timeout(HF_URL)) as response:
+                if response.status == 200:
+                    caption = (await response.json(content_type=None))[0]['generated_text']
+                    logging.info("Hugging Face подпись: %s", payload(caption), extra={"event": "caption"})
+                    return caption
+                logging.warning(f"Hugging Face не сработал: {response.status}")
+                return None
+        except Exception as e:
+            logging.warning(f"Ошибка Hugging Face: {e}")
+            return None
+
+    async def _try_alternative_async(self, session, image_data):
+        import aiohttp
+        try:
+            form = aiohttp.FormData()
+            form.add_field('image', image_data, filename='image.jpg')
+            async with session.post(ALTERNATIVE_URL, data=form,
+                                    timeout=self._timeout(ALTERNATIVE_URL)) as response:
+                if response.status == 200:
+                    caption = (await response.json(content_type=None)).get('caption', 'tattoo design')
+                    logging.info("Alternative API подпись: %s", payload(caption), extra={"event": "caption"})
+                    return caption
+                logging.warning(f"Alternative API не сработал: {response.status}")
+                return None
+        except Exception as e:
+            logging.warning(f"Ошибка Alternative API: {e}")
+            return None
+
+    async def _translate_async(self, session, caption):
+        return (await self.translate_many_async(session, [caption]))[0]
+
+    @metrics.timed("bot_stage_duration_seconds", stage="translate")
+    async def translate_many_async(self, session, captions):
+        results, missing = self._split_cached(captions)
+        if missing:
+            translated = None
+            providers = {"google_translate": self._translate_google_many_async,
+                         "libretranslate": self._translate_libre_many_async}
+            order = self._ranked(providers)
+            for name in order:
+                translated = await self._call_provider_async(name, providers[name], session, missing)
+                if translated:
+                    self._count_fallback("translate", name, order)
+                    break
+            self._store_translations(results, missing, translated)
+        return [results[caption] for caption in captions]
+
+    async def _translate_google_many_async(self, session, captions):
+        try:
+            logging.info("Попытка перевода через Google Translate")
+            async with session.get(GOOGLE_TRANSLATE_URL,
+                                   params=self._google_params(captions),
+                                   timeout=self._timeout(GOOGLE_TRANSLATE_URL)) as response:
+                if response.status == 200:
+                    translated = self._parse_google(await response.json(content_type=None), len(captions))
+                    if translated is None:
+                        translated = [await self._translate_google_many_async(session, [caption])
+                                      for caption in captions]
+                        return None if None in translated else [result[0] for result in translated]
+                    logging.info("Google Translate перевод: %s", payload(translated), extra={"event": "translate"})
+                    return translated
+                logging.warning(f"Google Translate не сработал: {response.status}")
+        except Exception as e:
+            logging.warning(f"Ошибка Google Translate: {e}")
+        return None
+
+    async def _translate_libre_many_async(self, session, captions):
+        try:
+            logging.info("Попытка перевода через LibreTranslate")
+            async with session.post(LIBRETRANSLATE_URL,
+                                    json=self._libre_payload(captions),
+                                    timeout=self._timeout(LIBRETRANSLATE_URL)) as response:
+                if response.status == 200:
+                    translated = self._parse_libre(await response.json(content_type=None), len(captions))
+                    logging.info("LibreTranslate перевод: %s", payload(translated), extra={"event": "translate"})
+                    return translated
+                logging.warning(f"LibreTranslate не сработал: {response.status}")
+        except Exception as e:
+            logging.warning(f"Ошибка LibreTranslate: {e}")
+        return None
+
+    @staticmethod
+    def _timeout(url):
+        import aiohttp
+        return aiohttp.ClientTimeout(total=http_client.timeout_for(url))
@@ -0,0 +1,84 @@
+from collections import deque
+
+
+# Многошаблонный поиск ключевых слов (автомат Ахо-Корасик).
+# Все списки ключевых слов компилируются один раз, после чего текст
+# просматривается за один линейный проход вместо отдельного
+# `any(keyword in text ...)` для каждой категории.
+class KeywordMatcher:
+
+    def __init__(self, categories):
+        # categories: {"sketch": [...], "tattoo": [...], ...}
+        self.categories = list(categories)
+        self.patterns = []
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+        index = {}
+        for category, keywords in categories.items():
+            for keyword in keywords:
+                keyword = keyword.lower()
+                if not keyword:
+                    continue
+                if keyword in index:
+                    cats = self.patterns[index[keyword]][1]
+                    if category not in cats:
+                        cats.append(category)
+                    continue
+                index[keyword] = len(self.patterns)
+                self.patterns.append((keyword, [category]))
+                self._add(keyword, index[keyword])
+        self._build()
+
+    def _add(self, keyword, pattern_id):
+        node = 0
+        for char in keyword:
+            nxt = self._goto[node].get(char)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+                self._goto[node][char] = nxt
+            node = nxt
+        self._out[node].append(pattern_id)
+
+    def _build(self):
+        # Суффиксные ссылки строим обходом в ширину; выходы узла дополняем
+        # выходами узла, на который указывает суффиксная ссылка
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(char, 0)
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+
+    def find(self, text):
+        # Возвращает {категория: [(позиция, ключевое слово), ...]} для всех совпадений
+        hits = {}
+        if not text:
+            return hits
+        goto, fail, out, patterns = self._goto, self._fail, self._out, self.patterns
+        node = 0
+        for pos, char in enumerate(text):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            for pattern_id in out[node]:
+                keyword, cats = patterns[pattern_id]
+                start = pos - len(keyword) + 1
+                for category in cats:
+                    hits.setdefault(category, []).append((start, keyword))
+        return hits
+
+    def first_category(self, text, priority):
+        # Первая по приоритету категория, найденная в тексте, или None
+        hits = self.find(text)
+        for category in priority:
+            if category in hits:
+                return category
+        return None
@@ -0,0 +1,92 @@
+import io
+import asyncio
+import logging
+import numpy as np
+from PIL import Image
+
+# Подпись для каждой категории: слово из keywords.py, по которому
+# classify_media однозначно определит ту же категорию по подписи
+CATEGORY_CAPTIONS = {
+    "sketch": "набросок",
+    "tattoo": "татуировка",
+    "in_progress": "процесс",
+    "equipment": "оборудование"
+}
+
+
+# Локальный классификатор без сети: считает по пикселям несколько дешёвых
+# признаков на NumPy и по порогам относит фото к категории classify_media.
+# Работает за миллисекунды и годится как основной или запасной вариант.
+class LocalFeatureBackend:
+    name = "local"
+    # Размер, до которого уменьшается изображение перед подсчётом признаков
+    analysis_size = 256
+
+    def __init__(self, sketch_paper=0.45, skin_tattoo=0.2, ink_min=0.02,
+                 redness_in_progress=0.08, equipment_metal=0.35, edge_min=0.01):
+        self.sketch_paper = sketch_paper
+        self.edge_min = edge_min
+        self.skin_tattoo = skin_tattoo
+        self.ink_min = ink_min
+        self.redness_in_progress = redness_in_progress
+        self.equipment_metal = equipment_metal
+
+    def features(self, image_data):
+        image = Image.open(io.BytesIO(image_data))
+        image.draft("RGB", (self.analysis_size, self.analysis_size))
+        image = image.convert("RGB")
+        image.thumbnail((self.analysis_size, self.analysis_size))
+        rgb = np.asarray(image, dtype=np.float32) / 255.0
+        r, g, b = rgb[..., 0], rgb[..., 1], rgb[..., 2]
+        gray = 0.299 * r + 0.587 * g + 0.114 * b
+        spread = rgb.max(axis=2) - rgb.min(axis=2)
+
+        gx = np.abs(np.diff(gray, axis=1))[:-1, :]
+        gy = np.abs(np.diff(gray, axis=0))[:, :-1]
+        edges = (gx + gy) > 0.15
+
+        # Правило Ковача для оттенков кожи при дневном освещении
+        skin = ((r > 0.37) & (g > 0.16) & (b > 0.08) & (spread > 0.06)
+                & (np.abs(r - g) > 0.06) & (r > g) & (r > b))
+        # Воспалённая кожа после сеанса: красный заметно сильнее зелёного
+        redness = skin & (r - g > 0.25)
+        paper = (gray > 0.85) & (spread < 0.1)
+        metal = (gray > 0.25) & (gray < 0.75) & (spread < 0.08)
+
+        return {
+            "ink_coverage": float((gray < 0.35).mean()),
+            "edge_density": float(edges.mean()),
+            "skin_share": float(skin.mean()),
+            "redness_share": float(redness.mean()),
+            "paper_share": float(paper.mean()),
+            "metal_share": float(metal.mean())
+        }
+
+    def classify(self, image_data):
+        features = self.features(image_data)
+        if features["paper_share"] >= self.sketch_paper and features["ink_coverage"] >= self.ink_min \
+                and features["edge_density"] >= self.edge_min and features["skin_share"] < 0.1:
+            category = "sketch"
+        elif features["skin_share"] >= self.skin_tattoo and features["ink_coverage"] >= self.ink_min:
+            category = "in_progress" if features["redness_share"] >= self.redness_in_progress else "tattoo"
+        elif features["metal_share"] >= self.equipment_metal and features["skin_share"] < 0.05:
+            category = "equipment"
+        else:
+            category = None
+        logging.info(f"Локальная классификация: {category}, признаки: {features}")
+        return category, features
+
+    # (категория, подпись на русском для classify_media) или None, если
+    # признаки неоднозначны
+    def describe(self, image_data):
+        try:
+            category, _ = self.classify(image_data)
+        except Exception as e:
+            logging.warning(f"Ошибка локальной классификации: {e}")
+            return None
+        if not category:
+            return None
+        return category, CATEGORY_CAPTIONS[category]
+
+    async def describe_async(self, session, image_data, limits):
+        return await asyncio.to_thread(self.describe, image_data)
@@ -0,0 +1,85 @@
+import time
+import logging
+import vk_api
+import http_client
+
+
+# Приём новых постов через Bots Long Poll API для развёртываний без
+# публичного адреса. Сервер держит запрос до wait секунд и отдаёт события;
+# ts сохраняется через save_ts, поэтому после перезапуска чтение
+# продолжается с того же места.
+#   failed=1 — история устарела, берём новый ts из ответа;
+#   failed=2 — истёк key, получаем новый key, ts прежний;
+#   failed=3 — информация утеряна, новые key и ts, пропущенное добираем on_gap.
+class LongPollListener:
+
+    def __init__(self, group_id, on_post, load_ts, save_ts, on_gap=None, wait=25):
+        self.group_id = str(group_id)
+        self.on_post = on_post
+        self.load_ts = load_ts
+        self.save_ts = save_ts
+        self.on_gap = on_gap
+        self.wait = wait
+        self.server = None
+        self.key = None
+        self.ts = None
+
+    def _get_server(self):
+        response = vk_api.call("groups.getLongPollServer", {"group_id": abs(int(self.group_id))})
+        self.server, self.key = response["server"], response["key"]
+        logging.info(f"Получен Long Poll сервер для группы {self.group_id}")
+        return str(response["ts"])
+
+    def start(self):
+        server_ts = self._get_server()
+        self.ts = self.load_ts(self.group_id) or server_ts
+
+    def poll_once(self):
+        response = http_client.get(self.server, params={
+            "act": "a_check", "key": self.key, "ts": self.ts, "wait": self.wait
+        }, timeout=self.wait + 10).json()
+        failed = response.get("failed")
+        if failed == 1:
+            logging.warning(f"Long Poll группы {self.group_id}: история устарела, продолжаем с ts={response.get('ts')}")
+            self._set_ts(response["ts"])
+            if self.on_gap:
+                self.on_gap()
+            return 0
+        if failed == 2:
+            logging.info(f"Long Poll группы {self.group_id}: истёк ключ, запрашиваем новый")
+            self._get_server()
+            return 0
+        if failed == 3:
+            logging.warning(f"Long Poll группы {self.group_id}: информация утеряна, переподключение")
+            self._set_ts(self._get_server())
+            if self.on_gap:
+                self.on_gap()
+            return 0
+        count = 0
+        for update in response.get("updates", []):
+            if update.get("type") == "wall_post_new":
+                post = update.get("object", {})
+                if post.get("post_type", "post") == "post":
+                    logging.info(f"Получен новый пост через Long Poll: ID={post.get('id')}")
+                    self.on_post(post)
+                    count += 1
+        self._set_ts(response["ts"])
+        return count
+
+    def _set_ts(self, ts):
+        self.ts = str(ts)
+        self.save_ts(self.group_id, self.ts)
+
+    def run_forever(self):
+        backoff = 1
+        while True:
+            try:
+                if self.server is None:
+                    self.start()
+                self.poll_once()
+                backoff = 1
+            except Exception as e:
+                logging.error(f"Ошибка Long Poll группы {self.group_id}: {e}")
+                self.server = None
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 60)
@@ -0,0 +1,123 @@
+import json
+import time
+import uuid
+import logging
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+
+
+# Локальная замена VK для проверки режима --longpoll без сети.
+# Отвечает на groups.getLongPollServer и act=a_check, хранит очередь событий
+# и умеет отдавать ошибки failed=1/2/3 по запросу.
+# Запуск: python longpoll_stub.py, затем VK_API_URL=http://127.0.0.1:8900/method/
+class LongPollStub:
+
+    def __init__(self, host="127.0.0.1", port=0, max_wait=2):
+        self.max_wait = max_wait
+        self.key = uuid.uuid4().hex
+        self.events = []  # события по порядку; ts события = его номер + 1
+        self.first_ts = 1
+        self.forced_failures = []
+        self._cond = threading.Condition()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self.url = f"http://{host}:{self._server.server_address[1]}"
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def push_post(self, post):
+        with self._cond:
+            self.events.append({"type": "wall_post_new", "object": post})
+            self._cond.notify_all()
+
+    def fail_next(self, code):
+        with self._cond:
+            self.forced_failures.append(code)
+            if code == 2:
+                self.key = uuid.uuid4().hex
+            self._cond.notify_all()
+
+    def _next_ts(self):
+        return len(self.events) + 1
+
+    def _server_info(self):
+        with self._cond:
+            return {"server": f"{self.url}/lp", "key": self.key, "ts": str(self._next_ts())}
+
+    def _check(self, params):
+        wait = min(float(params.get("wait", 25)), self.max_wait)
+        ts = int(params.get("ts", 0))
+        with self._cond:
+            if self.forced_failures:
+                code = self.forced_failures.pop(0)
+                return {"failed": code, "ts": str(self._next_ts())} if code == 1 else {"failed": code}
+            if params.get("key") != self.key:
+                return {"failed": 2}
+            if ts < self.first_ts:
+                return {"failed": 1, "ts": str(self._next_ts())}
+            self._cond.wait_for(lambda: self._next_ts() > ts or self.forced_failures, timeout=wait)
+            updates = self.events[ts - 1:]
+            return {"ts": str(self._next_ts()), "updates": updates}
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def _params(self):
+                parts = urlsplit(self.path)
+                params = {k: v[0] for k, v in parse_qs(parts.query).items()}
+                length = int(self.headers.get("Content-Length") or 0)
+                if length:
+                    params.update({k: v[0] for k, v in parse_qs(self.rfile.read(length).decode()).items()})
+                return parts.path, params
+
+            def _reply(self, payload):
+                body = json.dumps(payload).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _dispatch(self):
+                path, params = self._params()
+                if path.endswith("/groups.getLongPollServer"):
+                    self._reply({"response": stub._server_info()})
+                elif path == "/lp" and params.get("act") == "a_check":
+                    self._reply(stub._check(params))
+                else:
+                    self._reply({"error": {"error_code": 3, "error_msg": f"Unknown method {path}"}})
+
+            do_GET = _dispatch
+            do_POST = _dispatch
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--port', type=int, default=8900)
+    parser.add_argument('--group-id', type=int, default=-1)
+    parser.add_argument('--interval', type=float, default=10, help='Seconds between fake posts')
+    args = parser.parse_args()
+    stub = LongPollStub(port=args.port).start()
+    logging.info(f"Заглушка Long Poll запущена: VK_API_URL={stub.url}/method/")
+    post_id = 1
+    while True:
+        time.sleep(args.interval)
+        stub.push_post({"id": post_id, "owner_id": args.group_id, "date": int(time.time()),
+                        "text": "Новый эскиз", "attachments": []})
+        logging.info(f"Добавлен пост {post_id}")
+        post_id += 1
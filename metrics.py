@@ -0,0 +1,233 @@
+import json
+import time
+import bisect
+import inspect
+import logging
+import functools
+import threading
+from contextlib import contextmanager
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Границы корзин гистограмм, сек: от быстрых операций в памяти до
+# медленных запросов подписи с таймаутом
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60)
+
+DESCRIPTIONS = {
+    "bot_stage_duration_seconds": "Время этапов обработки поста",
+    "bot_provider_duration_seconds": "Время запросов к внешним сервисам подписи и перевода",
+    "bot_provider_skipped_total": "Запросы, не отправленные из-за открытого предохранителя",
+    "bot_fallback_total": "Результаты, полученные не от первого по порядку источника",
+    "bot_posts_processed_total": "Обработанные посты",
+    "bot_telegram_messages_total": "Сообщения Telegram по результату доставки",
+    "bot_cache_requests_total": "Обращения к кэшам подписей и переводов",
+    "bot_cache_hit_ratio": "Доля попаданий в кэш",
+    "bot_queue_depth": "Длина очередей обработки",
+}
+
+
+def _label_key(labels):
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    escaped = [(name, value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")) for name, value in pairs]
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+class _Histogram:
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    # Оценка перцентиля по корзинам (верхняя граница корзины)
+    def quantile(self, q):
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+
+# Реестр метрик процесса: гистограммы, счётчики и значения, вычисляемые
+# при чтении (размер очереди, доля попаданий в кэш). Отдаётся в текстовом
+# формате Prometheus или словарём для JSON.
+class MetricsRegistry:
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, keep_samples=False):
+        self.buckets = tuple(buckets)
+        # keep_samples=True — хранить и сами значения гистограмм (для бенчмарков,
+        # где нужны точные перцентили); в работе бота не включается
+        self.keep_samples = keep_samples
+        self.samples = {}
+        self._histograms = {}
+        self._counters = {}
+        self._gauges = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name, value, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = _Histogram(self.buckets)
+            histogram.observe(value)
+            if self.keep_samples:
+                self.samples.setdefault(name, {}).setdefault(key, []).append(value)
+
+    # Текущие значения счётчиков: {имя: {метки: значение}}
+    def counters(self):
+        with self._lock:
+            return {name: {key: value for key, value in series.items()} for name, series in self._counters.items()}
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+            self.samples.clear()
+
+    def inc(self, name, amount=1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + amount
+
+    # function возвращает число или список пар (метки, значение).
+    # metric_type="counter" — для счётчиков, которые ведёт сам объект (кэши)
+    def gauge(self, name, function, metric_type="gauge"):
+        with self._lock:
+            self._gauges[name] = (function, metric_type)
+
+    @contextmanager
+    def timer(self, name, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    # Декоратор для обычных и async-функций
+    def timed(self, name, **labels):
+        def decorator(function):
+            if inspect.iscoroutinefunction(function):
+                @functools.wraps(function)
+                async def async_wrapper(*args, **kwargs):
+                    with self.timer(name, **labels):
+                        return await function(*args, **kwargs)
+                return async_wrapper
+
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                with self.timer(name, **labels):
+                    return function(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def _gauge_values(self):
+        values = {}
+        for name, (function, metric_type) in list(self._gauges.items()):
+            try:
+                result = function()
+            except Exception as e:
+                logging.warning(f"Не удалось получить значение метрики {name}: {e}")
+                continue
+            if isinstance(result, (int, float)):
+                result = [({}, result)]
+            values[name] = (metric_type, [(_label_key(labels), value) for labels, value in result])
+        return values
+
+    def render_prometheus(self):
+        lines = []
+        with self._lock:
+            for name, series in sorted(self._histograms.items()):
+                lines.append(f"# HELP {name} {DESCRIPTIONS.get(name, name)}")
+                lines.append(f"# TYPE {name} histogram")
+                for key, histogram in sorted(series.items()):
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{_format_labels(key, [('le', repr(float(bound)))])} {cumulative}")
+                    lines.append(f"{name}_bucket{_format_labels(key, [('le', '+Inf')])} {histogram.count}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {histogram.sum}")
+                    lines.append(f"{name}_count{_format_labels(key)} {histogram.count}")
+            for name, series in sorted(self._counters.items()):
+                lines.append(f"# HELP {name} {DESCRIPTIONS.get(name, name)}")
+                lines.append(f"# TYPE {name} counter")
+                for key, value in sorted(series.items()):
+                    lines.append(f"{name}{_format_labels(key)} {value}")
+        for name, (metric_type, series) in sorted(self._gauge_values().items()):
+            lines.append(f"# HELP {name} {DESCRIPTIONS.get(name, name)}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            for key, value in series:
+                lines.append(f"{name}{_format_labels(key)} {value}")
+        return "\n".join(lines) + "\n"
+
+    # Те же данные словарём: для гистограмм — count, sum и оценки p50/p95/p99
+    def snapshot(self):
+        data = {"histograms": {}, "counters": {}, "gauges": {}}
+        with self._lock:
+            for name, series in self._histograms.items():
+                data["histograms"][name] = [{
+                    "labels": dict(key),
+                    "count": histogram.count,
+                    "sum": round(histogram.sum, 6),
+                    "p50": histogram.quantile(0.5),
+                    "p95": histogram.quantile(0.95),
+                    "p99": histogram.quantile(0.99)
+                } for key, histogram in series.items()]
+            for name, series in self._counters.items():
+                data["counters"][name] = [{"labels": dict(key), "value": value} for key, value in series.items()]
+        for name, (metric_type, series) in self._gauge_values().items():
+            data["counters" if metric_type == "counter" else "gauges"][name] = [{"labels": dict(key), "value": value} for key, value in series]
+        return data
+
+    def dump_json(self, path):
+        data = self.snapshot()
+        data["generated_at"] = time.time()
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=4)
+        logging.info(f"Метрики сохранены в {path}")
+
+    # HTTP-сервер в фоновом потоке: GET /metrics в формате Prometheus
+    def start_http_server(self, port, host="127.0.0.1"):
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = registry.render_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True, name="metrics").start()
+        logging.info(f"Метрики доступны на http://{host}:{server.server_address[1]}/metrics")
+        return server
+
+
+# Общий реестр процесса
+registry = MetricsRegistry()
@@ -0,0 +1,320 @@
+import os
+import json
+import time
+import atexit
+import sqlite3
+import logging
+import threading
+import subprocess
+
+
+# Отложенная запись состояния (write-behind).
+# Изменения только помечают состояние "грязным"; в хранилище оно пишется не
+# чаще одного раза за flush_interval, по требованию или при завершении
+# процесса. Само хранилище подключаемое (JSON-файл или SQLite), а
+# синхронизация через git — необязательный приёмник, который вызывается
+# один раз на каждый реальный сброс, а не на каждое изменение.
+# Чтобы сброс не перебирал всё состояние, изменения можно уточнять:
+# mark_dirty("ключ") — изменилось только это поле верхнего уровня,
+# add_processed(post_key) — добавлен ID обработанного поста. mark_dirty()
+# без ключей — при следующем сбросе состояние сверяется целиком.
+class StateStore:
+
+    def __init__(self, backend, flush_interval=300, sinks=None):
+        self.backend = backend
+        self.flush_interval = flush_interval
+        self.sinks = sinks or []
+        self.state = None
+        self._dirty = False
+        self._full = True
+        self._changed_keys = set()
+        self._added_posts = set()
+        self._last_flush = time.monotonic()
+        self.lock = threading.RLock()
+        atexit.register(self.close)
+
+    def load(self):
+        with self.lock:
+            self.state = self.backend.load()
+            self._full = True
+            return self.state
+
+    def mark_dirty(self, *keys):
+        with self.lock:
+            self._dirty = True
+            if keys:
+                self._changed_keys.update(keys)
+            else:
+                self._full = True
+
+    def add_processed(self, post_key):
+        with self.lock:
+            self._dirty = True
+            self._added_posts.add(post_key)
+
+    def maybe_flush(self):
+        # Сброс только если есть изменения и интервал истёк
+        with self.lock:
+            if self._dirty and time.monotonic() - self._last_flush >= self.flush_interval:
+                self.flush()
+
+    def flush(self):
+        with self.lock:
+            if self.state is None or not self._dirty:
+                return False
+            self._dirty = False
+            self._last_flush = time.monotonic()
+            changes = None if self._full else {"keys": self._changed_keys, "posts": self._added_posts}
+            try:
+                changed = self.backend.save(self.state, changes)
+            except Exception as e:
+                self._dirty = True
+                logging.error(f"Ошибка сохранения состояния: {e}")
+                return False
+            self._full = False
+            self._changed_keys = set()
+            self._added_posts = set()
+            if not changed:
+                logging.info("Состояние не изменилось, запись пропущена")
+                return False
+            if self.sinks:
+                self.backend.checkpoint()
+            for sink in self.sinks:
+                try:
+                    sink(self.backend.path)
+                except Exception as e:
+                    logging.error(f"Ошибка синхронизации состояния: {e}")
+            return True
+
+    def close(self):
+        self.flush()
+
+
+# Хранилище состояния в одном JSON-файле (исходный формат bot_state.json)
+class JsonStateBackend:
+
+    def __init__(self, path, default_state):
+        self.path = path
+        self.default_state = default_state
+        self._last_written = None
+
+    def load(self):
+        logging.info("Загрузка состояния из файла...")
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self._last_written = f.read()
+            state = json.loads(self._last_written)
+            logging.info("Состояние успешно загружено")
+            return state
+        except (FileNotFoundError, json.JSONDecodeError):
+            logging.info("Файл состояния не найден или повреждён, создаётся новый")
+            return self.default_state()
+
+    # Файл всегда пишется целиком, changes не нужны
+    def save(self, state, changes=None):
+        data = json.dumps(state, indent=4)
+        if data == self._last_written:
+            return False
+        logging.info("Сохранение состояния в файл...")
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(data)
+        os.replace(tmp_path, self.path)
+        self._last_written = data
+        return True
+
+    def checkpoint(self):
+        pass
+
+
+# Хранилище состояния в SQLite (режим WAL).
+# processed_posts — индексированная таблица, списки (старый формат
+# использованных комплиментов) — строки used_compliments, остальные поля —
+# пары ключ/значение. При сохранении пишутся только изменившиеся строки;
+# старые ID постов удаляются по retention_days.
+class SqliteStateBackend:
+
+    def __init__(self, path, default_state, json_path=None, retention_days=90):
+        self.path = path
+        self.default_state = default_state
+        self.json_path = json_path
+        self.retention_days = retention_days
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS processed_posts (
+                post_id TEXT PRIMARY KEY,
+                processed_at INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS processed_posts_at ON processed_posts (processed_at);
+            CREATE TABLE IF NOT EXISTS used_compliments (
+                deck TEXT NOT NULL,
+                position INTEGER NOT NULL,
+                compliment TEXT NOT NULL,
+                PRIMARY KEY (deck, position)
+            );
+        """)
+        # Снимок того, что уже лежит в базе, для вычисления разницы
+        self._saved_meta = {}
+        self._saved_posts = set()
+        self._saved_decks = {}
+
+    def load(self):
+        logging.info(f"Загрузка состояния из базы {self.path}...")
+        if not self._conn.execute("SELECT 1 FROM meta LIMIT 1").fetchone():
+            self._migrate_from_json()
+        state = self.default_state()
+        for key, value in self._conn.execute("SELECT key, value FROM meta"):
+            if key.startswith("_"):
+                continue
+            state[key] = json.loads(value)
+            self._saved_meta[key] = value
+        self.prune()
+        state["processed_posts"] = {
+            post_id: True for (post_id,) in self._conn.execute("SELECT post_id FROM processed_posts")
+        }
+        self._saved_posts = set(state["processed_posts"])
+        for deck in [key for key, value in state.items() if isinstance(value, list)]:
+            state[deck] = []
+        for deck, compliment in self._conn.execute(
+                "SELECT deck, compliment FROM used_compliments ORDER BY deck, position"):
+            state.setdefault(deck, []).append(compliment)
+        self._saved_decks = {key: list(value) for key, value in state.items() if isinstance(value, list)}
+        logging.info("Состояние успешно загружено")
+        return state
+
+    def _migrate_from_json(self):
+        # Разовый перенос существующего bot_state.json в базу
+        if not self.json_path or not os.path.exists(self.json_path):
+            self._conn.execute("INSERT OR REPLACE INTO meta VALUES ('_schema', '1')")
+            self._conn.commit()
+            return
+        logging.info(f"Миграция состояния из {self.json_path} в {self.path}")
+        state = JsonStateBackend(self.json_path, self.default_state).load()
+        self.save(state)
+        self._conn.execute("INSERT OR REPLACE INTO meta VALUES ('_schema', '1')")
+        self._conn.commit()
+        self._saved_meta, self._saved_posts, self._saved_decks = {}, set(), {}
+
+    # changes — {"keys": изменённые поля, "posts": добавленные ID постов}
+    # от StateStore; без них состояние сверяется с базой целиком
+    def save(self, state, changes=None):
+        if changes is not None:
+            return self._save_changes(state, changes)
+        changed = 0
+        with self._conn:
+            for key, value in state.items():
+                if key == "processed_posts":
+                    new_posts = [post_id for post_id in value if post_id not in self._saved_posts]
+                    removed = self._saved_posts.difference(value)
+                    changed += self._save_posts(new_posts, removed)
+                else:
+                    changed += self._save_key(key, value)
+            # Ключи, которых больше нет в состоянии, удаляются и из базы
+            for key in [key for key in self._saved_meta if key not in state]:
+                self._conn.execute("DELETE FROM meta WHERE key = ?", (key,))
+                del self._saved_meta[key]
+                changed += 1
+            for deck in [deck for deck in self._saved_decks if not isinstance(state.get(deck), list)]:
+                self._conn.execute("DELETE FROM used_compliments WHERE deck = ?", (deck,))
+                del self._saved_decks[deck]
+                changed += 1
+        return changed > 0
+
+    # Только перечисленные в changes поля и посты: стоимость сброса не
+    # зависит от размера всего состояния
+    def _save_changes(self, state, changes):
+        changed = 0
+        with self._conn:
+            processed_posts = state.get("processed_posts", {})
+            changed += self._save_posts([post_id for post_id in changes["posts"]
+                                         if post_id in processed_posts and post_id not in self._saved_posts], ())
+            for key in changes["keys"]:
+                if key == "processed_posts":
+                    continue
+                if key in state:
+                    changed += self._save_key(key, state[key])
+                elif key in self._saved_meta:
+                    self._conn.execute("DELETE FROM meta WHERE key = ?", (key,))
+                    del self._saved_meta[key]
+                    changed += 1
+        return changed > 0
+
+    def _save_posts(self, new_posts, removed):
+        now = int(time.time())
+        self._conn.executemany("INSERT OR IGNORE INTO processed_posts VALUES (?, ?)",
+                               [(post_id, now) for post_id in new_posts])
+        self._conn.executemany("DELETE FROM processed_posts WHERE post_id = ?",
+                               [(post_id,) for post_id in removed])
+        self._saved_posts.update(new_posts)
+        self._saved_posts.difference_update(removed)
+        return len(new_posts) + len(removed)
+
+    def _save_key(self, key, value):
+        if isinstance(value, list):
+            return self._save_deck(key, value)
+        encoded = json.dumps(value)
+        if self._saved_meta.get(key) == encoded:
+            return 0
+        self._conn.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (key, encoded))
+        self._saved_meta[key] = encoded
+        return 1
+
+    def _save_deck(self, deck, used):
+        saved = self._saved_decks.get(deck, [])
+        if used[:len(saved)] == saved:
+            # Обычный случай: в колоду только дописали новые комплименты
+            added = used[len(saved):]
+            self._conn.executemany("INSERT OR REPLACE INTO used_compliments VALUES (?, ?, ?)",
+                                   [(deck, len(saved) + i, comp) for i, comp in enumerate(added)])
+            changed = len(added)
+        else:
+            # Колода сброшена или переписана — перезаписываем её целиком
+            self._conn.execute("DELETE FROM used_compliments WHERE deck = ?", (deck,))
+            self._conn.executemany("INSERT INTO used_compliments VALUES (?, ?, ?)",
+                                   [(deck, i, comp) for i, comp in enumerate(used)])
+            changed = len(saved) + len(used)
+        self._saved_decks[deck] = list(used)
+        return changed
+
+    def checkpoint(self):
+        # Переносим WAL в основной файл базы, чтобы его можно было закоммитить
+        self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def prune(self):
+        # Удаляем ID постов, обработанных раньше, чем retention_days назад
+        if not self.retention_days:
+            return 0
+        cutoff = int(time.time()) - self.retention_days * 86400
+        with self._conn:
+            removed = self._conn.execute("DELETE FROM processed_posts WHERE processed_at < ?", (cutoff,)).rowcount
+        if removed:
+            logging.info(f"Удалено старых записей processed_posts: {removed}")
+        return removed
+
+
+# Приёмник для StateStore: коммитит и пушит файл состояния в репозиторий.
+# git config выполняется один раз за процесс.
+class GitSync:
+
+    def __init__(self, branch='main'):
+        self.branch = branch
+        self._configured = False
+
+    def __call__(self, path):
+        if not self._configured:
+            subprocess.run(['git', 'config', '--global', 'user.email', 'bot@example.com'], check=True)
+            subprocess.run(['git', 'config', '--global', 'user.name', 'Bot'], check=True)
+            self._configured = True
+        subprocess.run(['git', 'add', path], check=True)
+        result = subprocess.run(['git', 'commit', '-m', f'Update {path}'], capture_output=True, text=True)
+        if result.returncode == 0:
+            subprocess.run(['git', 'push', 'origin', self.branch], check=True)
+            logging.info("Состояние успешно сохранено")
+        else:
+            logging.info("Нет изменений для коммита")
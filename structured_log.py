@@ -0,0 +1,125 @@
+import sys
+import json
+import queue
+import atexit
+import random
+import reprlib
+import logging
+import logging.handlers
+from datetime import datetime, timezone
+
+DEFAULT_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+MAX_PAYLOAD = 500
+
+# Поля LogRecord, которые есть у любой записи; всё остальное пришло через extra
+_RECORD_FIELDS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "event"}
+
+
+# Сокращённый repr: не больше нескольких элементов на каждом уровне
+_repr = reprlib.Repr()
+_repr.maxlevel = 4
+_repr.maxdict = _repr.maxlist = _repr.maxtuple = 10
+_repr.maxstring = _repr.maxother = 120
+
+
+# Отложенное представление большого значения (ответ VK, текст поста).
+# Строка строится только если запись действительно пишется: словари и
+# списки обходятся через reprlib с ограничением на число элементов, итог
+# обрезается до limit символов, поэтому стоимость лога не растёт с
+# размером ответа.
+class Payload:
+    __slots__ = ("value", "limit")
+
+    def __init__(self, value, limit=None):
+        self.value = value
+        self.limit = limit or MAX_PAYLOAD
+
+    def __str__(self):
+        text = self.value[:self.limit + 1] if isinstance(self.value, str) else _repr.repr(self.value)
+        if len(text) <= self.limit:
+            return text
+        return f"{text[:self.limit]}..."
+
+    __repr__ = __str__
+
+
+def payload(value, limit=None):
+    return Payload(value, limit)
+
+
+# Пропускает только долю записей события: rates = {event: доля от 0 до 1}.
+# Записи без event и уровня WARNING и выше проходят всегда.
+class SamplingFilter(logging.Filter):
+
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record):
+        rate = self.rates.get(getattr(record, "event", None))
+        if rate is None or record.levelno >= logging.WARNING:
+            return True
+        return random.random() < rate
+
+
+# Обработчик, который кладёт запись в очередь без форматирования: сообщение
+# собирается и пишется в потоке QueueListener. Аргументы записи должны
+# не меняться после вызова (строки, числа, Payload от неизменяемых данных).
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+
+    def prepare(self, record):
+        return record
+
+
+# Одна запись — одна строка JSON: время, уровень, событие, сообщение и
+# поля из extra
+class JsonFormatter(logging.Formatter):
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "event": getattr(record, "event", None),
+            "message": record.getMessage()
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_FIELDS and not key.startswith("_"):
+                entry[key] = value if isinstance(value, (int, float, bool, type(None))) else str(value)
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+# Формат "событие=доля,событие=доля" из переменной окружения
+def parse_sample_rates(text):
+    rates = {}
+    for item in (text or "").split(","):
+        if "=" in item:
+            event, rate = item.split("=", 1)
+            rates[event.strip()] = float(rate)
+    return rates
+
+
+# Настройка корневого логгера: запись в очередь в вызывающем потоке,
+# форматирование и вывод в stderr — в отдельном потоке QueueListener
+def setup_logging(level="INFO", fmt="text", sample_rates=None, max_payload=None):
+    global MAX_PAYLOAD
+    if max_payload:
+        MAX_PAYLOAD = max_payload
+    stream_handler = logging.StreamHandler(sys.stderr)
+    stream_handler.setFormatter(JsonFormatter() if fmt == "json" else logging.Formatter(DEFAULT_FORMAT))
+    log_queue = queue.SimpleQueue()
+    queue_handler = DeferredQueueHandler(log_queue)
+    if sample_rates:
+        queue_handler.addFilter(SamplingFilter(sample_rates))
+    listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
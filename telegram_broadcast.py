@@ -0,0 +1,107 @@
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import requests
+import http_client
+
+MAX_ATTEMPTS = 3
+
+
+# Ведро токенов: не больше rate запросов в секунду с запасом capacity
+class TokenBucket:
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0
+        self._lock = threading.Lock()
+
+    # Ни один поток не получит токен раньше, чем через seconds секунд
+    def pause(self, seconds):
+        with self._lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self.tokens = 0
+            self.updated = self.paused_until
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    wait = self.paused_until - now
+                else:
+                    self.tokens = min(self.capacity, self.tokens + max(now - self.updated, 0) * self.rate)
+                    self.updated = max(now, self.updated)
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return
+                    wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+# Рассылка одного сообщения в несколько чатов параллельно.
+# Общий лимит Telegram (около 30 сообщений в секунду) и лимит на чат
+# (около 1 сообщения в секунду) соблюдаются ведрами токенов; на ответ 429
+# общее ведро ставится на паузу retry_after, и повтор ждёт вместе со всеми.
+# sendMessage не идемпотентен, поэтому повторяются только ошибки соединения,
+# 429 и 5xx: после таймаута чтения сообщение могло уже дойти.
+class TelegramBroadcaster:
+
+    def __init__(self, token, global_rate=30, chat_rate=1, max_workers=8, api_url="https://api.telegram.org"):
+        self.url = f"{api_url.rstrip('/')}/bot{token}/sendMessage"
+        self.global_bucket = TokenBucket(global_rate)
+        self.chat_rate = chat_rate
+        self.chat_buckets = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="telegram")
+
+    def _chat_bucket(self, chat_id):
+        with self._lock:
+            bucket = self.chat_buckets.get(chat_id)
+            if bucket is None:
+                bucket = self.chat_buckets[chat_id] = TokenBucket(self.chat_rate, 1)
+            return bucket
+
+    def send(self, chat_id, text):
+        result = {"ok": False, "status": None, "attempts": 0, "error": None}
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            result["attempts"] = attempt
+            self._chat_bucket(chat_id).acquire()
+            self.global_bucket.acquire()
+            try:
+                response = http_client.post(self.url, params={"chat_id": chat_id, "text": text})
+            except requests.ConnectionError as e:
+                result["error"] = str(e)
+                logging.error(f"Ошибка соединения с Telegram (chat_id={chat_id}): {e}")
+                continue
+            except Exception as e:
+                result["error"] = str(e)
+                logging.error(f"Ошибка отправки в Telegram (chat_id={chat_id}), без повтора: {e}")
+                break
+            result["status"] = response.status_code
+            if response.status_code == 200:
+                result["ok"] = True
+                result["error"] = None
+                logging.info(f"Сообщение успешно отправлено в Telegram (chat_id={chat_id})")
+                return result
+            result["error"] = response.text
+            if response.status_code == 429:
+                try:
+                    retry_after = response.json().get("parameters", {}).get("retry_after", 1)
+                except ValueError:
+                    retry_after = 1
+                logging.warning(f"Telegram просит подождать {retry_after} с (chat_id={chat_id})")
+                self.global_bucket.pause(retry_after)
+                continue
+            logging.error(f"Ошибка Telegram (chat_id={chat_id}): {response.status_code}, {response.text}")
+            if response.status_code < 500:
+                break
+        return result
+
+    # Возвращает {chat_id: результат доставки} для каждого получателя
+    def broadcast(self, text, chat_ids):
+        futures = {chat_id: self._executor.submit(self.send, chat_id, text) for chat_id in chat_ids}
+        return {chat_id: future.result() for chat_id, future in futures.items()}
@@ -0,0 +1,165 @@
+import json
+import logging
+import threading
+from collections import ChainMap, deque
+
+COMPLIMENT_TYPES = ["weekly", "client_interactions", "tattoo_ideas", "equipment_and_studio"]
+NAMESPACE_PREFIX = "tenant:"
+
+
+# Пустое пространство имён одной студии в состоянии бота
+def default_namespace():
+    return {
+        "last_checked_by_group": {},
+        "compliment_decks": {},
+        "scheduled_at": {}
+    }
+
+
+# Представление состояния студии; namespace_key — поле верхнего уровня
+# состояния, в котором лежит всё, что студия меняет (кроме ID постов)
+class TenantState(ChainMap):
+
+    def __init__(self, namespace_key, namespace, processed_posts):
+        super().__init__(namespace, {"processed_posts": processed_posts})
+        self.namespace_key = namespace_key
+
+
+# Одна студия: её группы VK, получатели в Telegram и недельные комплименты.
+# state — представление состояния студии: даты проверки групп, колоды и
+# время недельных комплиментов лежат в своём пространстве имён
+# (state["tenant:<name>"]), а обработанные посты — в общем словаре, ключи
+# которого и так различаются по группе. Функции бота работают с ним так
+# же, как с обычным состоянием.
+class Tenant:
+
+    def __init__(self, name, group_ids, chat_ids, compliments, namespace, processed_posts):
+        self.name = name
+        self.group_ids = group_ids
+        self.recipients = chat_ids
+        self.compliments = compliments
+        self.namespace = namespace
+        self.state = TenantState(NAMESPACE_PREFIX + name, namespace, processed_posts)
+
+
+# Реестр студий из файла конфигурации:
+# {"tenants": [{"name": "...", "group_ids": ["-1"], "chat_ids": ["1"],
+#               "compliments": ["weekly", ...]}]}
+# compliments необязателен (по умолчанию все недельные комплименты).
+# Одна группа принадлежит только одной студии: обработанные посты общие.
+class TenantRegistry:
+
+    def __init__(self, tenants):
+        self.tenants = tenants
+        self.by_group = {}
+        for tenant in tenants:
+            for group_id in tenant.group_ids:
+                self.by_group[group_id] = tenant
+
+    # Состояние каждой группы всех студий — для одного общего опроса стен
+    def group_states(self):
+        return {group_id: tenant.state for group_id, tenant in self.by_group.items()}
+
+    def tenant_for(self, post):
+        return self.by_group.get(str(post.get("owner_id")))
+
+
+def _string_list(entry, key, name):
+    values = entry.get(key)
+    if isinstance(values, (str, int)):
+        values = [values]
+    values = [str(value).strip() for value in values or [] if str(value).strip()]
+    if not values:
+        raise ValueError(f"у студии {name} не задан {key}")
+    return values
+
+
+# Загрузка реестра. Пространства имён студий создаются в state при первом
+# запуске; пространства студий, убранных из файла, остаются в состоянии
+# (студию можно вернуть без потери колод)
+def load_tenants(path, state):
+    with open(path, encoding="utf-8") as f:
+        config = json.load(f)
+    entries = config.get("tenants", []) if isinstance(config, dict) else config
+    tenants = []
+    names = set()
+    owners = {}
+    for entry in entries:
+        name = str(entry.get("name") or "").strip()
+        if not name:
+            raise ValueError(f"в {path} есть студия без name")
+        if name in names:
+            raise ValueError(f"студия {name} указана в {path} дважды")
+        names.add(name)
+        group_ids = _string_list(entry, "group_ids", name)
+        for group_id in group_ids:
+            if group_id in owners:
+                raise ValueError(f"группа {group_id} указана у студий {owners[group_id]} и {name}")
+            owners[group_id] = name
+        compliments = entry.get("compliments", COMPLIMENT_TYPES)
+        unknown = [kind for kind in compliments if kind not in COMPLIMENT_TYPES]
+        if unknown:
+            raise ValueError(f"у студии {name} неизвестные типы комплиментов: {unknown}")
+        namespace = state.setdefault(NAMESPACE_PREFIX + name, default_namespace())
+        namespace.pop("last_checked", None)
+        for key, value in default_namespace().items():
+            namespace.setdefault(key, value)
+        tenants.append(Tenant(name, group_ids, _string_list(entry, "chat_ids", name), list(compliments),
+                              namespace, state["processed_posts"]))
+    logging.info(f"Загружено студий: {len(tenants)}, групп: {len(owners)}")
+    return TenantRegistry(tenants)
+
+
+# Общий пул потоков для всех студий. У каждой студии своя очередь задач;
+# свободный поток берёт по одной задаче у студий по кругу, поэтому студия
+# с сотней новых постов не задерживает остальных. Задачи одной студии
+# выполняются строго по очереди (комплименты выбираются в хронологическом
+# порядке, колоды студии меняет один поток).
+class FairWorkerPool:
+
+    def __init__(self, workers=4):
+        self._queues = {}  # студия -> очередь задач
+        self._ready = deque()  # студии с задачами, которые сейчас никто не выполняет
+        self._unfinished = 0
+        self._cond = threading.Condition()
+        for i in range(workers):
+            threading.Thread(target=self._work, daemon=True, name=f"tenant-worker-{i}").start()
+
+    def submit(self, tenant, function, *args):
+        with self._cond:
+            tasks = self._queues.get(tenant)
+            if tasks is None:
+                tasks = self._queues[tenant] = deque()
+                self._ready.append(tenant)
+            tasks.append((function, args))
+            self._unfinished += 1
+            self._cond.notify_all()
+
+    def pending(self):
+        with self._cond:
+            return self._unfinished
+
+    # Ждёт выполнения всех задач
+    def join(self):
+        with self._cond:
+            while self._unfinished:
+                self._cond.wait()
+
+    def _work(self):
+        while True:
+            with self._cond:
+                while not self._ready:
+                    self._cond.wait()
+                tenant = self._ready.popleft()
+                function, args = self._queues[tenant].popleft()
+            try:
+                function(*args)
+            except Exception as e:
+                logging.error(f"Ошибка задачи студии {tenant}: {e}")
+            with self._cond:
+                if self._queues[tenant]:
+                    self._ready.append(tenant)
+                else:
+                    del self._queues[tenant]
+                self._unfinished -= 1
+                self._cond.notify_all()
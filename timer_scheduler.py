@@ -0,0 +1,150 @@
+import heapq
+import random
+import asyncio
+import logging
+from datetime import datetime, timedelta
+
+# Даже без близких сроков цикл просыпается раз в час, чтобы перевод часов
+# или сон машины не сдвинули запуск надолго
+MAX_SLEEP = 3600
+WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+
+
+# Случайное время между start_hour:00 и end_hour:00 в указанный день
+def random_time_on(day, start_hour=10, end_hour=13):
+    start = datetime.combine(day, datetime.min.time()).replace(hour=start_hour)
+    return start + timedelta(minutes=random.randrange((end_hour - start_hour) * 60))
+
+
+# План "раз в неделю в этот день недели в случайное время": ближайший
+# такой день после after (сегодня — если выбранное время ещё впереди).
+# После срабатывания (fired) — не раньше завтрашнего дня, иначе в тот же
+# день могло выпасть ещё одно случайное время позже отправленного.
+def weekly_on(weekday):
+    index = WEEKDAYS.index(weekday)
+
+    def plan(after, fired=False):
+        start = after.date() + timedelta(days=1) if fired else after.date()
+        day = start + timedelta(days=(index - start.weekday()) % 7)
+        planned = random_time_on(day)
+        if planned <= after:
+            planned = random_time_on(day + timedelta(days=7))
+        return planned
+
+    return plan
+
+
+# План "раз в неделю в случайный день": после срабатывания — случайный день
+# следующей недели; при первом планировании — один из оставшихся дней этой
+def weekly_random_day(after, fired=False):
+    monday = after.date() - timedelta(days=after.weekday())
+    if not fired:
+        days = [monday + timedelta(days=i) for i in range(after.weekday() + 1, 7)]
+        if days:
+            return random_time_on(random.choice(days))
+    return random_time_on(monday + timedelta(days=7 + random.randrange(7)))
+
+
+# Планировщик на asyncio: время следующего запуска каждой задачи лежит в
+# min-heap, цикл спит ровно до ближайшего срока, без ежесекундных проверок.
+# Для недельных задач запланированное время хранится в planned (словарь из
+# состояния бота) и сохраняется через persist до запуска задачи, поэтому
+# перезапуск не перевыбирает случайное время: задача не отправится дважды
+# и не пропустит неделю. Срок, пропущенный пока бот был выключен, выполняется
+# сразу, если опоздание не больше missed_grace, иначе переносится.
+# У задачи может быть свой словарь planned (например, у каждой студии).
+class TimerScheduler:
+
+    def __init__(self, planned, persist, missed_grace=timedelta(hours=12)):
+        self.planned = planned
+        self.persist = persist
+        self.missed_grace = missed_grace
+        self._heap = []
+        self._jobs = {}
+        self._running = set()
+        self._seq = 0
+        self._unsaved = False
+
+    def _push(self, due, name):
+        self._seq += 1
+        heapq.heappush(self._heap, (due, self._seq, name))
+
+    # Задача каждые seconds секунд; первый запуск — сразу
+    def every(self, name, seconds, function):
+        self._jobs[name] = {"function": function, "interval": timedelta(seconds=seconds)}
+        self._push(datetime.now(), name)
+
+    # Задача по плану plan(after, fired) -> datetime следующего запуска.
+    # planned — где хранить время запуска, по умолчанию общий словарь
+    def planned_job(self, name, function, plan, planned=None, key=None):
+        self._jobs[name] = {"function": function, "plan": plan,
+                            "planned": self.planned if planned is None else planned, "key": key or name}
+        now = datetime.now()
+        due = self._load(name)
+        if due and due < now - self.missed_grace:
+            logging.warning(f"Запуск {name} на {due} пропущен, переносим на следующий срок")
+            due = self._plan(name, now, fired=True, save=False)
+        elif due and due < now:
+            logging.info(f"Запуск {name} на {due} пропущен, выполняем сейчас")
+        elif not due:
+            due = self._plan(name, now, fired=False, save=False)
+        logging.info(f"Запланирован запуск {name} на {due:%A %Y-%m-%d %H:%M}")
+        self._push(due, name)
+
+    def _load(self, name):
+        job = self._jobs[name]
+        value = job["planned"].get(job["key"])
+        try:
+            return datetime.fromisoformat(value) if value else None
+        except ValueError:
+            logging.warning(f"Некорректное время запуска {name}: {value}, планируем заново")
+            return None
+
+    # save=False — сохранить вместе с остальными при старте run
+    def _plan(self, name, after, fired, save=True):
+        job = self._jobs[name]
+        due = job["plan"](after, fired)
+        job["planned"][job["key"]] = due.isoformat()
+        if save:
+            self.persist()
+        else:
+            self._unsaved = True
+        return due
+
+    def next_due(self):
+        return self._heap[0][0] if self._heap else None
+
+    async def _run_job(self, name):
+        self._running.add(name)
+        try:
+            await asyncio.to_thread(self._jobs[name]["function"])
+        except Exception as e:
+            logging.error(f"Ошибка в задаче {name}: {e}")
+        finally:
+            self._running.discard(name)
+
+    async def run(self):
+        tasks = set()
+        if self._unsaved:
+            self.persist()
+            self._unsaved = False
+        while self._heap:
+            due, _, name = self._heap[0]
+            delay = (due - datetime.now()).total_seconds()
+            if delay > 0:
+                await asyncio.sleep(min(delay, MAX_SLEEP))
+                continue
+            heapq.heappop(self._heap)
+            job = self._jobs[name]
+            if "interval" in job:
+                self._push(max(due + job["interval"], datetime.now()), name)
+            else:
+                # Следующий срок сохраняется до запуска: перезапуск во время
+                # или после отправки не повторит её
+                self._push(self._plan(name, max(due, datetime.now()), fired=True), name)
+            if name in self._running:
+                logging.warning(f"Задача {name} ещё выполняется, запуск пропущен")
+                continue
+            task = asyncio.create_task(self._run_job(name))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
@@ -0,0 +1,66 @@
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+
+
+# Память переводов подписей: LRU в памяти перед таблицей SQLite.
+# Подписи BLIP короткие и часто повторяются, поэтому один раз переведённая
+# подпись больше не уходит во внешний сервис.
+class TranslationCache:
+
+    def __init__(self, path, memory_size=1024, disk_size=50000):
+        self.path = path
+        self.memory_size = memory_size
+        self.disk_size = disk_size
+        self.stats = {"hits": 0, "misses": 0}
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS translations (
+                source TEXT PRIMARY KEY,
+                translated TEXT NOT NULL,
+                accessed_at INTEGER NOT NULL
+            )
+        """)
+        self._conn.commit()
+
+    def get(self, source):
+        with self._lock:
+            translated = self._memory.get(source)
+            if translated is None:
+                row = self._conn.execute(
+                    "SELECT translated FROM translations WHERE source = ?", (source,)).fetchone()
+                if row:
+                    translated = row[0]
+                    # Отметка обращения: вытеснение с диска — по давности использования
+                    with self._conn:
+                        self._conn.execute("UPDATE translations SET accessed_at = ? WHERE source = ?",
+                                           (int(time.time()), source))
+                    self._remember(source, translated)
+            else:
+                self._memory.move_to_end(source)
+            self.stats["hits" if translated is not None else "misses"] += 1
+            return translated
+
+    def put_many(self, pairs):
+        now = int(time.time())
+        with self._lock:
+            with self._conn:
+                self._conn.executemany("INSERT OR REPLACE INTO translations VALUES (?, ?, ?)",
+                                       [(source, translated, now) for source, translated in pairs])
+                excess = self._conn.execute("SELECT COUNT(*) FROM translations").fetchone()[0] - self.disk_size
+                if excess > 0:
+                    self._conn.execute(
+                        "DELETE FROM translations WHERE source IN "
+                        "(SELECT source FROM translations ORDER BY accessed_at LIMIT ?)", (excess,))
+            for source, translated in pairs:
+                self._remember(source, translated)
+
+    def _remember(self, source, translated):
+        self._memory[source] = translated
+        self._memory.move_to_end(source)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
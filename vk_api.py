@@ -0,0 +1,68 @@
+import json
+import logging
+from config import Config
+import http_client
+
+VK_API_URL = Config.VK_API_URL
+VK_API_VERSION = "5.131"
+# VK разрешает не больше 25 вызовов API внутри одного execute
+EXECUTE_BATCH_SIZE = 25
+
+
+class VKError(Exception):
+    pass
+
+
+def call(method, params):
+    params = dict(params, access_token=Config.VK_TOKEN, v=VK_API_VERSION)
+    response = http_client.post(VK_API_URL + method, data=params).json()
+    if "error" in response:
+        raise VKError(f"{method}: {response['error'].get('error_msg')}")
+    return response["response"]
+
+
+# Запрашивает стены нескольких групп, упаковывая до 25 wall.get в один execute.
+# Возвращает {owner_id: ответ wall.get или None, если вызов для группы не удался}
+def wall_get_many(owner_ids, count=5, offset=0):
+    results = {}
+    for i in range(0, len(owner_ids), EXECUTE_BATCH_SIZE):
+        batch = owner_ids[i:i + EXECUTE_BATCH_SIZE]
+        if len(batch) == 1:
+            try:
+                results[batch[0]] = call("wall.get", {"owner_id": batch[0], "count": count, "offset": offset})
+            except Exception as e:
+                logging.error(f"Ошибка wall.get для {batch[0]}: {e}")
+                results[batch[0]] = None
+            continue
+        calls = ",".join(
+            "API.wall.get(" + json.dumps({"owner_id": int(owner_id), "count": count, "offset": offset}) + ")"
+            for owner_id in batch
+        )
+        try:
+            responses = call("execute", {"code": f"return [{calls}];"})
+        except Exception as e:
+            logging.error(f"Ошибка execute для {len(batch)} групп: {e}")
+            responses = [None] * len(batch)
+        for owner_id, response in zip(batch, responses):
+            # Неудачный вызов внутри execute возвращает false
+            results[owner_id] = response or None
+    return results
+
+
+# Страницы стены одной группы по списку offset, до 25 wall.get в одном execute.
+# Возвращает ответы wall.get в порядке offsets (None для неудачных вызовов)
+def wall_get_pages(owner_id, offsets, count=100):
+    results = []
+    for i in range(0, len(offsets), EXECUTE_BATCH_SIZE):
+        batch = offsets[i:i + EXECUTE_BATCH_SIZE]
+        calls = ",".join(
+            "API.wall.get(" + json.dumps({"owner_id": int(owner_id), "count": count, "offset": offset}) + ")"
+            for offset in batch
+        )
+        try:
+            responses = call("execute", {"code": f"return [{calls}];"})
+        except Exception as e:
+            logging.error(f"Ошибка execute для страниц стены {owner_id}: {e}")
+            responses = [None] * len(batch)
+        results.extend(response or None for response in responses)
+    return results
@@ -0,0 +1,40 @@
+import hmac
+import logging
+from flask import Flask, request
+from config import Config
+from metrics import registry as metrics
+
+
+# Приёмник событий VK Callback API.
+# Подтверждает адрес сервера, проверяет секретный ключ и отдаёт новые посты
+# в on_post, сразу отвечая "ok": сама обработка идёт в фоне, поэтому ответ
+# укладывается в отведённое VK время.
+def create_app(on_post):
+    app = Flask(__name__)
+
+    @app.route(Config.WEBHOOK_PATH, methods=["POST"])
+    def vk_callback():
+        event = request.get_json(silent=True) or {}
+        event_type = event.get("type")
+        if Config.VK_CALLBACK_SECRET and not hmac.compare_digest(
+                str(event.get("secret", "")), Config.VK_CALLBACK_SECRET):
+            logging.warning(f"Событие VK с неверным секретным ключом отклонено: {event_type}")
+            return "forbidden", 403
+        if event_type == "confirmation":
+            logging.info(f"Запрос подтверждения сервера от группы {event.get('group_id')}")
+            return Config.VK_CONFIRMATION_CODE or ""
+        if event_type == "wall_post_new":
+            post = event.get("object", {})
+            if post.get("post_type", "post") == "post":
+                logging.info(f"Получен новый пост по Callback API: ID={post.get('id')}")
+                on_post(post)
+        return "ok"
+
+    # Метрики на том же (публичном) порту, если отдельный порт недоступен
+    # (например, на Heroku) — только при явном WEBHOOK_METRICS=1
+    if Config.WEBHOOK_METRICS:
+        @app.route("/metrics")
+        def prometheus_metrics():
+            return metrics.render_prometheus(), 200, {"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
+
+    return app